@@ -123,6 +123,18 @@ CACHES = {
     }
 }
 
+# Cached template fragments (sidebar): lifetime, extra time a stale value may be served while it is rebuilt,
+# lifetime of the lock of the process that builds a missing value, and how long other processes wait for it
+# before they build the value themselves (in seconds)
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+FRAGMENT_CACHE_GRACE = 60 * 5
+FRAGMENT_CACHE_LOCK_TIMEOUT = 5
+FRAGMENT_CACHE_WAIT = 0.2
+
+# Full pages cached for anonymous visitors, purged by the generations of articles, comments, categories and tags.
+# Counters (views, ratings) on a cached page may be this old
+PAGE_CACHE_TIMEOUT = 60 * 5
+
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -211,7 +223,7 @@ customColorPalette = [
 ]
 
 # CKEDITOR_5_CUSTOM_CSS = 'path_to.css' # optional
-# CKEDITOR_5_FILE_STORAGE = 'modules.services.utils.CkeditorCustomStorage'
+CKEDITOR_5_FILE_STORAGE = 'modules.services.utils.CkeditorCustomStorage'
 CKEDITOR_5_CONFIGS = {
     'default': {
         'toolbar': [
@@ -289,10 +301,170 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/Moscow'
+# Image processing is CPU bound, it runs in a separate prefork worker (celery-images in docker-compose.dev.yml):
+# celery -A backend worker -Q images -P prefork
+CELERY_TASK_ROUTES = {
+    'modules.services.tasks.process_thumbnail_task': {'queue': 'images'},
+    'modules.services.tasks.process_thumbnails_task': {'queue': 'images'},
+    'modules.services.tasks.process_avatar_task': {'queue': 'images'},
+}
 
 CELERY_BEAT_SCHEDULE = {
     'backup_database': {
         'task': 'modules.services.tasks.dbackup_task', # Path to the task specified in tasks.py
         'schedule': crontab(hour=0, minute=0),  # The backup will be created every day at midnight
     },
-}
\ No newline at end of file
+    'flush_viewers': {
+        'task': 'modules.services.tasks.flush_viewers_task',
+        'schedule': crontab(),  # Buffered article views are written to the database every minute
+    },
+    'rebuild_similarity_index': {
+        'task': 'modules.services.tasks.rebuild_similarity_index_task',
+        'schedule': crontab(hour=3, minute=0, day_of_week=1),  # Full rebuild of similar articles every Monday
+    },
+    'rebuild_tag_popularity': {
+        'task': 'modules.services.tasks.rebuild_tag_popularity_task',
+        'schedule': crontab(hour=4, minute=0),  # Tag counters are recalculated every night
+    },
+    'generate_sitemaps': {
+        'task': 'modules.services.tasks.generate_sitemaps_task',
+        'schedule': crontab(minute='*/15'),  # Changed sitemap pages are written to disk every 15 minutes
+    },
+    'collect_uploads': {
+        'task': 'modules.services.tasks.collect_uploads_task',
+        'schedule': crontab(hour=5, minute=0),  # Uploaded files no article links to are deleted every night
+    },
+}
+
+
+
+# Article views
+
+# 'redis' - views are buffered in Redis and flushed in bulk by celery beat, 'database' - written on every request
+VIEWERS_INGESTION = env('VIEWERS_INGESTION', default='redis')
+# How long (in seconds) a visitor is remembered in Redis to skip repeated views of the same article
+VIEWERS_DEDUP_TIMEOUT = 60 * 60 * 24
+# Maximum number of articles taken from the buffer in one flush
+VIEWERS_FLUSH_BATCH = 500
+
+
+
+# Similar articles
+
+# Number of similar articles shown on the article page, randomly sampled from the precomputed pool
+SIMILAR_ARTICLES_COUNT = 6
+# Number of neighbours stored per article
+SIMILAR_ARTICLES_POOL = 18
+# Maximum number of articles (with the most shared tags) compared with an article
+SIMILAR_ARTICLES_CANDIDATES = 1000
+
+
+
+# Search
+
+# Maximum length of a search query, longer queries are truncated
+SEARCH_QUERY_MAX_LENGTH = 200
+# Number of ranked article ids cached per query, pages beyond it are read from the database
+SEARCH_CACHE_WINDOW = 500
+SEARCH_CACHE_TIMEOUT = 60 * 15
+# Number of popular queries kept in the log and warmed up by warm_search_cache_task
+SEARCH_POPULAR_LOG_SIZE = 1000
+SEARCH_WARM_QUERIES = 50
+
+
+
+# Pagination of article lists: 'offset' - numbered pages, 'keyset' - cursor pagination (next/previous)
+ARTICLE_PAGINATION = env('ARTICLE_PAGINATION', default='offset')
+
+
+
+# Subscription timelines
+
+# Number of article ids kept in the timeline of every user
+TIMELINE_SIZE = 1000
+# Articles of authors with more followers are not pushed to timelines but read at request time
+TIMELINE_FANOUT_MAX_FOLLOWERS = 10000
+
+
+
+# Popular tags
+
+# Number of tags shown in the sidebar, read from the tag popularity table
+POPULAR_TAGS_COUNT = 20
+
+
+
+# Comments
+
+# Number of root comment threads rendered with the article and returned by one request of the comment threads endpoint
+COMMENT_THREADS_PER_PAGE = 10
+# Number of levels of a thread read at once, deeper replies are loaded on demand
+COMMENT_THREAD_DEPTH = 3
+# Storage of comment threads: 'mptt' - nested sets of django-mptt, 'path' - materialized path (inserts do not lock the thread).
+# The path is always kept, so switching to 'path' needs nothing; switching back to 'mptt' needs Comment.objects.rebuild()
+COMMENT_TREE_BACKEND = env('COMMENT_TREE_BACKEND', default='mptt')
+
+
+
+# Sitemap
+
+# Directory the sitemap index and its pages are generated to
+SITEMAP_ROOT = MEDIA_ROOT / 'sitemaps'
+# Range of article ids per sitemap page
+SITEMAP_PAGE_SIZE = 10000
+
+
+
+# Images
+
+# Widths of the resized variants of article thumbnails (srcset), rendered in WebP and JPEG
+THUMBNAIL_WIDTHS = (240, 480, 960)
+# Sizes of the square variants of avatars: small for comments and subscriber lists, medium for the profile page
+AVATAR_SIZES = {'small': 120, 'medium': 300}
+# Seconds an uploaded editor file is kept without any article linking it (drafts are not saved yet)
+UPLOAD_BLOB_GRACE = 60 * 60 * 24
+
+
+
+# Rendered text
+
+# Articles with a longer full description (in characters) are rendered by celery after the save
+ARTICLE_RENDER_INLINE_LIMIT = 100000
+
+
+
+# Database backups (dbackup)
+
+# Directory of the backups, every backup is a directory of compressed shards (one per model) with a manifest
+DBACKUP_DIR = Path(env('DBACKUP_DIR', default=str(BASE_DIR / 'backups')))
+# Number of the newest full backups kept, together with the incremental backups based on them
+DBACKUP_RETENTION = 4
+# Days between full backups, the scheduled backups in between are incremental
+DBACKUP_FULL_INTERVAL = 7
+# Number of processes dumping the models in parallel, backups started by celery run in one process
+DBACKUP_WORKERS = 4
+# 'gzip' or 'zstd' (requires the zstandard package)
+DBACKUP_COMPRESSION = env('DBACKUP_COMPRESSION', default='gzip')
+DBACKUP_COMPRESSION_LEVEL = 6
+# Rows fetched from the server side cursor and written to a shard at once
+DBACKUP_CHUNK_SIZE = 2000
+# Not backed up. A restore is refused while an excluded table has rows referring to the restored ones,
+# so the admin log (it refers to the users) is backed up with the rest
+DBACKUP_EXCLUDE = ('sessions.session',)
+# Incremental backups dump only the rows of these models inserted since the previous backup or changed since
+# its watermark (the latest value of the field), any other model is dumped in full
+DBACKUP_WATERMARKS = {
+    'blog.article': 'updated_at',
+    'blog.comment': 'updated_at',
+    'blog.rating': 'updated_at',
+}
+# Models whose rows are only inserted and deleted, never changed
+DBACKUP_APPEND_ONLY = (
+    'blog.viewer',
+    'blog.article_viewers',
+    'system.feedback',
+    'system.profile_following',
+    'taggit.taggeditem',
+)
+# Seconds subtracted from the watermark, for the rows saved by transactions committed after the previous backup started
+DBACKUP_WATERMARK_OVERLAP = 60 * 60
\ No newline at end of file
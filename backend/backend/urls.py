@@ -2,15 +2,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
-from django.contrib.sitemaps.views import sitemap
 
-from modules.blog.sitemaps import StaticSitemap, ArticleSitemap
-
-
-sitemaps = {
-    'static': StaticSitemap,
-    'articles': ArticleSitemap
-}
+from modules.blog.views import SitemapView
 
 
 handler403 = 'modules.system.views.tr_handler403'
@@ -23,7 +16,8 @@ urlpatterns = [
     path('', include('modules.system.urls', namespace='system')),
     path('admin/', admin.site.urls),
     path('ckeditor5/', include('django_ckeditor_5.urls')),
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    path('sitemap.xml', SitemapView.as_view(), {'name': 'sitemap'}, name='sitemap'),
+    path('sitemaps/<slug:name>.xml', SitemapView.as_view(), name='sitemap_section'),
 ]
 
 if settings.DEBUG:
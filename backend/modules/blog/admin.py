@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.contrib import admin
+from django.utils.html import format_html
 
 from mptt.admin import DraggableMPTTAdmin
 
@@ -25,7 +27,6 @@ class ArticleAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("title",)}
 
 
-@admin.register(Comment)
 class CommentAdmin(DraggableMPTTAdmin):
     list_display = ('tree_actions', 'indented_title', 'article', 'author', 'created_at', 'status')
     mptt_level_indent = 2
@@ -34,6 +35,34 @@ class CommentAdmin(DraggableMPTTAdmin):
     list_editable = ('status',)
 
 
+class CommentPathAdmin(admin.ModelAdmin):
+    """
+    Comments of the 'path' backend, which does not keep the MPTT fields: the threads are listed in the order
+    of their paths and a reply cannot be moved to another parent
+    """
+
+    list_display = ('indented_title', 'article', 'author', 'created_at', 'status')
+    mptt_level_indent = 2
+    list_display_links = ('article',)
+    list_filter = ('created_at', 'updated_at', 'author')
+    list_editable = ('status',)
+    ordering = ('path',)
+
+    @admin.display(description='Comment')
+    def indented_title(self, comment):
+        return format_html('<div style="text-indent:{}px">{}</div>', comment.depth * self.mptt_level_indent, comment)
+
+    def get_readonly_fields(self, request, obj=None):
+        return ('parent',) if obj else ()
+
+    def save_model(self, request, obj, form, change):
+        with Comment.objects.disable_mptt_updates():
+            obj.save()
+
+
+admin.site.register(Comment, CommentAdmin if settings.COMMENT_TREE_BACKEND == 'mptt' else CommentPathAdmin)
+
+
 @admin.register(Rating)
 class RatingAdmin(admin.ModelAdmin):
     list_display = ["id", "article", "user", "value", "created_at", "ip_address"]
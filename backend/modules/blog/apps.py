@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'modules.blog'
-    verbose_name = 'blog'
\ No newline at end of file
+    verbose_name = 'blog'
+
+    def ready(self):
+        from . import signals
\ No newline at end of file
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Number of comments'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='rating_sum',
+            field=models.IntegerField(default=0, verbose_name='Rating'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Number of views'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_article_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Similarity')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='blog.article', verbose_name='Article')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.article', verbose_name='Similar article')),
+            ],
+            options={
+                'verbose_name': 'Similar article',
+                'verbose_name_plural': 'Similar articles',
+                'db_table': 'app_article_similarities',
+                'ordering': ('-score',),
+                'indexes': [models.Index(fields=['article', '-score'], name='app_article_article_878a33_idx')],
+                'unique_together': {('article', 'similar')},
+            },
+        ),
+    ]
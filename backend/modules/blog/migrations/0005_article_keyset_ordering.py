@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:52
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_article_search_vector'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='article',
+            options={'ordering': ['-fixed', '-created_at', 'id'], 'verbose_name': 'Post', 'verbose_name_plural': 'Posts'},
+        ),
+    ]
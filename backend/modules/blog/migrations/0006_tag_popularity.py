@@ -0,0 +1,28 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        ('blog', '0005_article_keyset_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagPopularity',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='taggit.tag', verbose_name='Tag')),
+                ('article_count', models.PositiveIntegerField(default=0, verbose_name='Published articles')),
+            ],
+            options={
+                'verbose_name': 'Tag popularity',
+                'verbose_name_plural': 'Tag popularity',
+                'db_table': 'app_tag_popularity',
+                'indexes': [models.Index(fields=['-article_count'], name='app_tag_pop_article_1a08a6_idx')],
+            },
+        ),
+    ]
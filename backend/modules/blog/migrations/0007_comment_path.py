@@ -0,0 +1,33 @@
+# Generated by Django 4.2.6 on 2026-10-18 06:59
+
+from django.db import migrations, models
+
+
+BACKFILL_PATHS_SQL = '''
+    WITH RECURSIVE tree AS (
+        SELECT id, lpad(to_hex(id), 10, '0') AS path FROM app_comments WHERE parent_id IS NULL
+        UNION ALL
+        SELECT comment.id, tree.path || lpad(to_hex(comment.id), 10, '0')
+        FROM app_comments AS comment JOIN tree ON comment.parent_id = tree.id
+    )
+    UPDATE app_comments SET path = tree.path FROM tree WHERE app_comments.id = tree.id
+'''
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_tag_popularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, db_collation='C', editable=False, max_length=1000, verbose_name='Materialized path'),
+        ),
+        migrations.RunSQL(BACKFILL_PATHS_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['article', 'path'], name='app_comment_article_22b2fe_idx'),
+        ),
+    ]
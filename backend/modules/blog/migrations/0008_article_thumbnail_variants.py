@@ -0,0 +1,28 @@
+# Generated by Django 4.2.6 on 2026-10-18 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_comment_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='thumbnail_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Preview height'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='thumbnail_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Preview variants'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='thumbnail_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Preview width'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.6 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_article_thumbnail_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadBlob',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='File name')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Size')),
+                ('reference_count', models.PositiveIntegerField(default=0, verbose_name='Articles linking the file')),
+                ('uploaded_at', models.DateTimeField(auto_now=True, verbose_name='Time of the last upload')),
+            ],
+            options={
+                'verbose_name': 'Uploaded file',
+                'verbose_name_plural': 'Uploaded files',
+                'db_table': 'app_upload_blobs',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.6 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_upload_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=500, verbose_name='Excerpt'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='full_description_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Rendered full description'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='render_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Version of the rendered text'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='short_description_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Rendered short description'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of words'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.6 on 2026-10-18 07:23
+
+from django.db import migrations, models
+
+
+# Existing ratings were last changed at an unknown time, the time they were added is the best guess
+BACKFILL_UPDATED_AT_SQL = 'UPDATE blog_rating SET updated_at = created_at'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_article_rendered_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rating',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Update time'),
+        ),
+        migrations.RunSQL(BACKFILL_UPDATED_AT_SQL, migrations.RunSQL.noop),
+    ]
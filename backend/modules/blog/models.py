@@ -1,17 +1,35 @@
-from django.db import models
+from django.db import models, connection, transaction
+from django.conf import settings
 from django.core.validators import FileExtensionValidator
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 
 from mptt.models import MPTTModel, TreeForeignKey
 from taggit.managers import TaggableManager
+from taggit.models import Tag
 from django_ckeditor_5.fields import CKEditor5Field
 
-from ..services.utils import unique_slugify, image_compress
+from ..services.utils import save_with_unique_slug
+from ..services.rendering import RENDER_VERSION, render_html, make_excerpt
 
 
 
 User = get_user_model()
+
+
+def article_search_vector():
+    """
+    Search document of an article: the title (weight A) and the full description without HTML tags (weight B)
+    """
+
+    full_description = models.Func(
+        models.F('full_description'), models.Value('<[^>]+>'), models.Value(' '), models.Value('g'),
+        function='regexp_replace',
+        output_field=models.TextField()
+    )
+    return SearchVector('title', weight='A') + SearchVector(full_description, weight='B')
     
 
 
@@ -20,17 +38,64 @@ class ArticleManager(models.Manager):
     def all(self):
         return self.get_queryset()\
                 .select_related('author', 'category')\
-                .prefetch_related('ratings', 'viewers')\
                 .filter(status='P')
     
     def detail(self):
         return self.get_queryset()\
                 .select_related('author', 'category')\
-                .prefetch_related('comments', 'comments__author', 'comments__author__profile', 'tags', 'ratings')\
+                .prefetch_related('tags')\
                 .filter(status='P')
 
 
 
+class RatingManager(models.Manager):
+
+    TOGGLE_SQL = '''
+        WITH existing AS (
+            SELECT id, value FROM {rating}
+            WHERE article_id = %(article_id)s AND ip_address = %(ip_address)s
+            FOR UPDATE
+        ), removed AS (
+            DELETE FROM {rating} WHERE id IN (SELECT id FROM existing WHERE value = %(value)s)
+            RETURNING -value AS delta, 'deleted'::text AS status
+        ), changed AS (
+            UPDATE {rating} SET value = %(value)s, user_id = %(user_id)s, updated_at = now()
+            WHERE id IN (SELECT id FROM existing WHERE value <> %(value)s)
+            RETURNING value - (SELECT value FROM existing) AS delta, 'updated'::text AS status
+        ), inserted AS (
+            INSERT INTO {rating} (article_id, ip_address, value, user_id, created_at, updated_at)
+            SELECT CAST(%(article_id)s AS bigint), CAST(%(ip_address)s AS inet), %(value)s, CAST(%(user_id)s AS integer), now(), now()
+            WHERE NOT EXISTS (SELECT 1 FROM existing)
+            ON CONFLICT (article_id, ip_address) DO NOTHING
+            RETURNING value AS delta, 'created'::text AS status
+        ), outcome AS (
+            SELECT delta, status FROM removed
+            UNION ALL SELECT delta, status FROM changed
+            UNION ALL SELECT delta, status FROM inserted
+        )
+        UPDATE {article} SET rating_sum = rating_sum + COALESCE((SELECT SUM(delta) FROM outcome), 0)
+        WHERE id = %(article_id)s
+        RETURNING (SELECT status FROM outcome), rating_sum
+    '''
+
+    def toggle(self, article_id, ip_address, value, user_id=None):
+        """
+        Like/dislike toggle in a single statement: the same value again removes the rating, another value replaces it.
+        Returns the status ('created', 'updated', 'deleted' or None for a lost double-click race) and the new rating sum.
+        """
+
+        sql = self.TOGGLE_SQL.format(rating=self.model._meta.db_table, article=Article._meta.db_table)
+        params = {'article_id': article_id, 'ip_address': ip_address, 'value': value, 'user_id': user_id}
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+            if row is None:
+                raise Article.DoesNotExist(f'Article {article_id} does not exist')
+        return row
+
+
+
 class Category(MPTTModel):
 
     class MPTTMeta:
@@ -111,8 +176,11 @@ class Article(models.Model):
 
     class Meta:
         db_table = 'app_articles'
-        ordering = ['-fixed', '-created_at']
-        indexes = [models.Index(fields=['-fixed', '-created_at', 'status'])]
+        ordering = ['-fixed', '-created_at', 'id']
+        indexes = [
+            models.Index(fields=['-fixed', '-created_at', 'status']),
+            GinIndex(fields=['search_vector'], name='app_articles_search_gin'),
+        ]
         verbose_name = 'Post'
         verbose_name_plural = 'Posts'
 
@@ -168,6 +236,32 @@ class Article(models.Model):
         verbose_name='Full description',
         config_name='extends'
     )
+    short_description_html = models.TextField(
+        verbose_name='Rendered short description',
+        blank=True,
+        editable=False
+    )
+    full_description_html = models.TextField(
+        verbose_name='Rendered full description',
+        blank=True,
+        editable=False
+    )
+    excerpt = models.CharField(
+        verbose_name='Excerpt',
+        max_length=500,
+        blank=True,
+        editable=False
+    )
+    word_count = models.PositiveIntegerField(
+        verbose_name='Number of words',
+        default=0,
+        editable=False
+    )
+    render_version = models.PositiveSmallIntegerField(
+        verbose_name='Version of the rendered text',
+        default=0,
+        editable=False
+    )
     thumbnail = models.ImageField(
         verbose_name='Post preview', 
         blank=True, 
@@ -176,6 +270,24 @@ class Article(models.Model):
             FileExtensionValidator(allowed_extensions=('png', 'jpg', 'webp', 'jpeg', 'gif'))
         ]
     )
+    thumbnail_width = models.PositiveIntegerField(
+        verbose_name='Preview width',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    thumbnail_height = models.PositiveIntegerField(
+        verbose_name='Preview height',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    thumbnail_variants = models.JSONField(
+        verbose_name='Preview variants',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     status = models.CharField(
         choices=STATUS_OPTIONS, 
         default='Published', 
@@ -194,43 +306,236 @@ class Article(models.Model):
         verbose_name='Recorded', 
         default=False
     )
+    view_count = models.PositiveIntegerField(
+        verbose_name='Number of views',
+        default=0
+    )
+    rating_sum = models.IntegerField(
+        verbose_name='Rating',
+        default=0
+    )
+    comment_count = models.PositiveIntegerField(
+        verbose_name='Number of comments',
+        default=0
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Search document',
+        null=True,
+        editable=False
+    )
 
 
     tags = TaggableManager()
     objects = ArticleManager()
 
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.__thumbnail = self.thumbnail if self.pk else None
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Values loaded from the database, used to detect changes on save
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         return self.title
     
     def get_absolute_url(self):
         return reverse('blog:article_detail', kwargs={'slug': self.slug})
+
+    RENDERED_FIELDS = ('short_description_html', 'full_description_html', 'excerpt', 'word_count', 'render_version')
+
+    def render(self, full=True):
+        """
+        Rendering the text of the editor into the stored HTML, excerpt and number of words (modules.services.rendering).
+        Without full only the short description is rendered and the full one is marked as not rendered.
+        """
+
+        self.short_description_html = render_html(self.short_description).html
+        if not full:
+            self.render_version = 0
+            return
+        rendered = render_html(self.full_description)
+        self.full_description_html = rendered.html
+        self.excerpt = make_excerpt(rendered.text)
+        self.word_count = rendered.word_count
+        self.render_version = RENDER_VERSION
+
+    @property
+    def get_full_description(self):
+        """
+        The rendered full description, the rendered short description while a big article waits for render_article_task.
+        The text of the editor is never shown unrendered. An article rendered by an older version keeps its HTML
+        until rerender_articles.
+        """
+
+        if self.render_version:
+            return self.full_description_html
+        return self.short_description_html
+
+    @property
+    def reading_time(self):
+        return max(1, round(self.word_count / 200))
     
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = unique_slugify(self, self.title)
-        super().save(*args, **kwargs)
+        loaded = getattr(self, '_loaded_values', {})
+        deferred = self.get_deferred_fields()
+        if not {'short_description', 'full_description'} & deferred and (
+            self.render_version != RENDER_VERSION
+            or self.short_description != loaded.get('short_description')
+            or self.full_description != loaded.get('full_description')
+        ):
+            # Big articles are rendered by render_article_task after the commit (see signals)
+            self.render(full=len(self.full_description) <= settings.ARTICLE_RENDER_INLINE_LIMIT)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], *self.RENDERED_FIELDS}
+
+        if self.thumbnail.name != getattr(self, '_loaded_values', {}).get('thumbnail'):
+            # The upload is stored as is, the resized variants are rendered on the 'images' queue (see signals)
+            self._obsolete_variants = [variant['name'] for variants in self.thumbnail_variants.values() for variant in variants]
+            self.thumbnail_width = self.thumbnail_height = None
+            self.thumbnail_variants = {}
+        if self.slug:
+            super().save(*args, **kwargs)
+        else:
+            save_with_unique_slug(self, self.title, super().save, *args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'title', 'full_description'} & set(update_fields):
+            Article.objects.filter(pk=self.pk).update(search_vector=article_search_vector())
+
+        # The text is kept as well, the links to uploaded files are counted against it and it is not rendered twice
+        texts = {field: getattr(self, field) for field in ('short_description', 'full_description') if field not in deferred}
+        self._loaded_values = {**loaded, **texts, 'thumbnail': self.thumbnail.name, 'status': self.status}
+    
 
-        if self.__thumbnail != self.thumbnail and self.thumbnail:
-            image_compress(self.thumbnail.path, width=500, height=500)
 
-    def get_sum_rating(self):
-        return sum([rating.value for rating in self.ratings.all()])
-    
+class ArticleSimilarity(models.Model):
+    """
+    Precomputed top-N similar articles (weighted Jaccard over tags), maintained by modules.services.similarity
+    """
+
+    class Meta:
+        db_table = 'app_article_similarities'
+        unique_together = ('article', 'similar')
+        indexes = [models.Index(fields=['article', '-score'])]
+        ordering = ('-score',)
+        verbose_name = 'Similar article'
+        verbose_name_plural = 'Similar articles'
+
+
+    article = models.ForeignKey(
+        to=Article,
+        verbose_name='Article',
+        on_delete=models.CASCADE,
+        related_name='similarities'
+    )
+    similar = models.ForeignKey(
+        to=Article,
+        verbose_name='Similar article',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField(
+        verbose_name='Similarity'
+    )
+
+
+    def __str__(self):
+        return f'{self.article_id}-{self.similar_id}: {self.score:.3f}'
+
+
+
+class TagPopularity(models.Model):
+    """
+    Number of published articles per tag, maintained by modules.services.tags
+    """
+
+    class Meta:
+        db_table = 'app_tag_popularity'
+        indexes = [models.Index(fields=['-article_count'])]
+        verbose_name = 'Tag popularity'
+        verbose_name_plural = 'Tag popularity'
+
+
+    tag = models.OneToOneField(
+        to=Tag,
+        verbose_name='Tag',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity'
+    )
+    article_count = models.PositiveIntegerField(
+        verbose_name='Published articles',
+        default=0
+    )
+
+
+    def __str__(self):
+        return f'{self.tag_id}: {self.article_count}'
+
+
+
+class UploadBlob(models.Model):
+    """
+    A file uploaded through the editor, stored once under its content hash by CkeditorCustomStorage.
+    reference_count is the number of articles whose text links the file, maintained by modules.services.uploads
+    """
+
+    class Meta:
+        db_table = 'app_upload_blobs'
+        verbose_name = 'Uploaded file'
+        verbose_name_plural = 'Uploaded files'
+
+
+    name = models.CharField(
+        verbose_name='File name',
+        max_length=100,
+        primary_key=True
+    )
+    size = models.PositiveBigIntegerField(
+        verbose_name='Size'
+    )
+    reference_count = models.PositiveIntegerField(
+        verbose_name='Articles linking the file',
+        default=0
+    )
+    uploaded_at = models.DateTimeField(
+        verbose_name='Time of the last upload',
+        auto_now=True
+    )
+
+
+    def __str__(self):
+        return self.name
+
 
 
 class Comment(MPTTModel):
+    """
+    Comments are stored both as an MPTT tree and as a materialized path (the fixed width hex ids of the ancestors
+    and of the comment itself). The path is always kept, the MPTT fields only while COMMENT_TREE_BACKEND is 'mptt'.
+    """
+
+    PATH_STEP = 10
+    PATH_MAX_DEPTH = 100
+    PATH_SQL = '''
+        UPDATE {comment} AS comment
+        SET path = coalesce((SELECT parent.path FROM {comment} AS parent WHERE parent.id = comment.parent_id), '') || %s
+        WHERE comment.id = %s
+        RETURNING comment.path
+    '''
 
-    class MTTMeta:
-        order_insertion_by = ('-created_at',)
+    class MPTTMeta:
+        # New replies are appended as the last child: ordering by created_at would also renumber
+        # the tree_id of every root comment of the site on each new root comment
+        order_insertion_by = ()
 
     class Meta:
         db_table = 'app_comments'
-        indexes = [models.Index(fields=['-created_at', 'updated_at', 'status', 'parent'])]
+        indexes = [
+            models.Index(fields=['-created_at', 'updated_at', 'status', 'parent']),
+            models.Index(fields=['article', 'path']),
+        ]
         ordering = ['-created_at']
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
@@ -279,10 +584,32 @@ class Comment(MPTTModel):
         related_name='children', 
         on_delete=models.CASCADE
     )
+    path = models.CharField(
+        verbose_name='Materialized path',
+        max_length=PATH_STEP * PATH_MAX_DEPTH,
+        db_collation='C',
+        editable=False,
+        blank=True
+    )
 
 
     def __str__(self):
         return f'{self.author}:{self.content}'
+
+    @classmethod
+    def path_segment(cls, pk):
+        return f'{pk:0{cls.PATH_STEP}x}'
+
+    @property
+    def depth(self):
+        return len(self.path) // self.PATH_STEP - 1
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if not self.path:
+            with connection.cursor() as cursor:
+                cursor.execute(self.PATH_SQL.format(comment=self._meta.db_table), [self.path_segment(self.pk), self.pk])
+                self.path = cursor.fetchone()[0]
     
 
 
@@ -320,10 +647,24 @@ class Rating(models.Model):
         verbose_name='Add time', 
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Update time',
+        auto_now=True
+    )
     ip_address = models.GenericIPAddressField(
         verbose_name='IP address'
     )
 
 
+    objects = RatingManager()
+
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Values loaded from the database, the previous value is needed to adjust Article.rating_sum on update
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
         return self.article
\ No newline at end of file
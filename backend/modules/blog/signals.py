@@ -0,0 +1,254 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from mptt.signals import node_moved
+from taggit.models import Tag, TaggedItem
+
+from .models import Article, Category, Viewer, Rating, Comment
+
+from ..system.models import Profile
+from ..services.tasks import (
+    update_article_similarity_task, fanout_article_task, retract_article_task, rebuild_timeline_task, process_thumbnail_task,
+    render_article_task
+)
+from ..services.cache import bump_generation
+from ..services.tags import adjust_tag_counts, article_tag_ids
+from ..services.uploads import adjust_upload_references, article_uploads, referenced_uploads
+
+
+
+# <-- Denormalized Article counters -->
+
+
+@receiver(m2m_changed, sender=Article.viewers.through)
+def update_view_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keeping Article.view_count in step with the article-viewer links
+    """
+
+    if not reverse:
+        if action == 'post_add':
+            Article.objects.filter(pk=instance.pk).update(view_count=F('view_count') + len(pk_set))
+        elif action == 'pre_remove':
+            removed = sender.objects.filter(article_id=instance.pk, viewer_id__in=pk_set).count()
+            Article.objects.filter(pk=instance.pk).update(view_count=F('view_count') - removed)
+        elif action == 'post_clear':
+            Article.objects.filter(pk=instance.pk).update(view_count=0)
+        return
+
+    if action == 'post_add':
+        article_ids = pk_set
+    elif action == 'pre_remove':
+        article_ids = sender.objects.filter(viewer_id=instance.pk, article_id__in=pk_set).values('article_id')
+    elif action == 'pre_clear':
+        article_ids = sender.objects.filter(viewer_id=instance.pk).values('article_id')
+    else:
+        return
+
+    delta = 1 if action == 'post_add' else -1
+    Article.objects.filter(pk__in=article_ids).update(view_count=F('view_count') + delta)
+
+
+@receiver(pre_delete, sender=Viewer)
+def release_viewer(sender, instance, **kwargs):
+    article_ids = Article.viewers.through.objects.filter(viewer_id=instance.pk).values('article_id')
+    Article.objects.filter(pk__in=article_ids).update(view_count=F('view_count') - 1)
+
+
+@receiver(post_save, sender=Rating)
+def add_rating(sender, instance, created, **kwargs):
+    loaded_values = getattr(instance, '_loaded_values', {})
+    delta = instance.value if created else instance.value - loaded_values.get('value', instance.value)
+    if delta:
+        Article.objects.filter(pk=instance.article_id).update(rating_sum=F('rating_sum') + delta)
+    instance._loaded_values = {**loaded_values, 'value': instance.value}
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating(sender, instance, **kwargs):
+    Article.objects.filter(pk=instance.article_id).update(rating_sum=F('rating_sum') - instance.value)
+
+
+@receiver(post_save, sender=Comment)
+def add_comment(sender, instance, created, **kwargs):
+    if created:
+        Article.objects.filter(pk=instance.article_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def remove_comment(sender, instance, **kwargs):
+    Article.objects.filter(pk=instance.article_id).update(comment_count=F('comment_count') - 1)
+
+
+
+# <-- Similar articles index -->
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def tags_changed(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Article):
+        transaction.on_commit(lambda: update_article_similarity_task.delay(instance.pk))
+
+
+@receiver(post_save, sender=Article)
+def status_changed(sender, instance, created, **kwargs):
+    if not created and getattr(instance, '_loaded_values', {}).get('status') != instance.status:
+        transaction.on_commit(lambda: update_article_similarity_task.delay(instance.pk))
+
+
+
+# <-- Tag popularity -->
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def count_tags(sender, instance, action, pk_set, **kwargs):
+    """
+    Only the tags of published articles are counted
+    """
+
+    if not isinstance(instance, Article) or instance.status != 'P':
+        return
+    if action == 'post_add':
+        adjust_tag_counts(pk_set, 1)
+    elif action == 'pre_remove':
+        adjust_tag_counts(pk_set, -1)
+    elif action == 'pre_clear':
+        adjust_tag_counts(article_tag_ids(instance.pk), -1)
+
+
+@receiver(post_save, sender=Article)
+def count_tags_on_publish(sender, instance, created, **kwargs):
+    was_published = getattr(instance, '_loaded_values', {}).get('status') == 'P'
+    if not created and was_published != (instance.status == 'P'):
+        adjust_tag_counts(article_tag_ids(instance.pk), -1 if was_published else 1)
+
+
+@receiver(pre_delete, sender=Article)
+def uncount_tags(sender, instance, **kwargs):
+    if instance.status == 'P':
+        adjust_tag_counts(article_tag_ids(instance.pk), -1)
+
+
+# <-- Cache invalidation -->
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def invalidate_articles(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_generation('articles'))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def invalidate_categories(sender, **kwargs):
+    transaction.on_commit(lambda: bump_generation('categories'))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+def invalidate_tags(sender, **kwargs):
+    transaction.on_commit(lambda: bump_generation('tags'))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, **kwargs):
+    transaction.on_commit(lambda: bump_generation('comments'))
+
+
+
+# <-- Subscription timelines -->
+
+
+@receiver(post_save, sender=Article)
+def article_published(sender, instance, created, **kwargs):
+    if instance.status == 'P' and getattr(instance, '_loaded_values', {}).get('status') != 'P':
+        transaction.on_commit(lambda: fanout_article_task.delay(instance.pk))
+
+
+@receiver(post_save, sender=Article)
+def article_unpublished(sender, instance, created, **kwargs):
+    if instance.status != 'P' and getattr(instance, '_loaded_values', {}).get('status') == 'P':
+        article_id, author_id = instance.pk, instance.author_id
+        transaction.on_commit(lambda: retract_article_task.delay(article_id, author_id))
+
+
+@receiver(post_delete, sender=Article)
+def article_deleted(sender, instance, **kwargs):
+    if instance.status == 'P':
+        article_id, author_id = instance.pk, instance.author_id
+        transaction.on_commit(lambda: retract_article_task.delay(article_id, author_id))
+
+
+@receiver(m2m_changed, sender=Profile.following.through)
+def subscriptions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        user_ids = [instance.user_id]
+    elif pk_set:
+        user_ids = list(Profile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
+    else:
+        return
+
+    for user_id in user_ids:
+        transaction.on_commit(lambda user_id=user_id: rebuild_timeline_task.delay(user_id))
+
+
+
+# <-- Thumbnail variants -->
+
+
+@receiver(post_save, sender=Article)
+def thumbnail_changed(sender, instance, **kwargs):
+    if instance.thumbnail.name == getattr(instance, '_loaded_values', {}).get('thumbnail'):
+        return
+    article_id, name, obsolete = instance.pk, instance.thumbnail.name, getattr(instance, '_obsolete_variants', [])
+    if name or obsolete:
+        transaction.on_commit(lambda: process_thumbnail_task.delay(article_id, name, obsolete))
+
+
+
+# <-- Upload references -->
+
+
+@receiver(post_save, sender=Article)
+def count_upload_references(sender, instance, created, **kwargs):
+    """
+    The difference between the files linked by the saved text and by the text loaded from the database.
+    Articles saved with deferred descriptions did not change them.
+    """
+
+    if 'full_description' in instance.get_deferred_fields():
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    previous = set() if created else referenced_uploads(loaded.get('short_description'), loaded.get('full_description'))
+    current = article_uploads(instance)
+    adjust_upload_references(current - previous, 1)
+    adjust_upload_references(previous - current, -1)
+
+
+@receiver(pre_delete, sender=Article)
+def release_upload_references(sender, instance, **kwargs):
+    adjust_upload_references(article_uploads(instance), -1)
+
+
+
+# <-- Rendered text -->
+
+
+@receiver(post_save, sender=Article)
+def render_big_article(sender, instance, **kwargs):
+    """
+    Article.save renders the full description of big articles as not rendered, they are rendered after the commit
+    """
+
+    if instance.render_version == 0 and 'render_version' not in instance.get_deferred_fields():
+        article_id = instance.pk
+        transaction.on_commit(lambda: render_article_task.delay(article_id))
@@ -1,21 +1,61 @@
 from django import template
-from django.db.models import Count
+from django.core.files.storage import default_storage
 
-from taggit.models import Tag
-
-from ..models import Comment
+from ..models import Category, Comment
+from ...services.cache import get_or_build
+from ...services.tags import get_popular_tags
 
 
 register = template.Library()
 
 
+@register.simple_tag(takes_context=True)
+def url_replace(context, **kwargs):
+    """
+    Query string of the current request with some parameters replaced, pagination links keep the search query
+    """
+
+    query = context['request'].GET.copy()
+    for key, value in kwargs.items():
+        query[key] = value
+    # Numbered and cursor pagination do not mix
+    query.pop('page' if 'cursor' in kwargs else 'cursor', None)
+    return query.urlencode()
+
+
+@register.simple_tag
+def category_tree():
+    return get_or_build('sidebar-categories', lambda: list(Category.objects.all()), generations=('categories',))
+
+
 @register.simple_tag
 def popular_tags():
-    tags = Tag.objects.annotate(num_times=Count('article')).order_by('-num_times')
-    return list(tags.values('name', 'num_times', 'slug'))
+    return get_or_build('sidebar-tags', get_popular_tags, generations=('tags',))
 
 
 @register.inclusion_tag('includes/latest_comments.html')
 def show_latest_comments(count=5):
-    comments = Comment.objects.select_related('author').filter(status='P').order_by('-created_at')[:count]
-    return {'comments': comments}
\ No newline at end of file
+    def build():
+        comments = Comment.objects.select_related('author').filter(status='P').order_by('-created_at')[:count]
+        return [{'author': comment.author.username, 'content': comment.content} for comment in comments]
+
+    return {'comments': get_or_build(f'sidebar-comments-{count}', build, generations=('comments',))}
+
+
+@register.simple_tag
+def thumbnail_srcset(article, image_format):
+    variants = article.thumbnail_variants.get(image_format, [])
+    return ', '.join(f'{default_storage.url(variant["name"])} {variant["width"]}w' for variant in variants)
+
+
+@register.simple_tag
+def thumbnail_url(article, width):
+    """
+    The narrowest JPEG variant that is at least width wide, the upload itself while the variants are not rendered yet
+    """
+
+    variants = article.thumbnail_variants.get('jpeg', [])
+    if not variants:
+        return article.thumbnail.url if article.thumbnail else ''
+    variant = next((variant for variant in variants if variant['width'] >= width), variants[-1])
+    return default_storage.url(variant['name'])
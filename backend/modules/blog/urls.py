@@ -4,9 +4,9 @@ from .views import (
     ArticleListView, ArticleDetailView,
     ArticleByCategoryListView, ArticleByTagListView,
     ArticleCreateView, ArticleUpdateView,
-    ArticleDeleteView, CommentCreateView,
+    ArticleDeleteView, CommentCreateView, CommentThreadView,
     ArticleSearchResultView, RatingCreateView,
-    ArticleBySignedUser,
+    ArticleBySignedUser, PageFragmentsView,
 )
 
 
@@ -20,9 +20,11 @@ urlpatterns = [
     path('articles/<slug:slug>/delete/', ArticleDeleteView.as_view(), name='article_delete'),
     path('articles/<slug:slug>/', ArticleDetailView.as_view(), name='article_detail'),
     path('articles/<int:pk>/comments/create/', CommentCreateView.as_view(), name='comment_create_view'),
+    path('articles/<int:pk>/comments/', CommentThreadView.as_view(), name='comment_threads'),
     path('articles/tags/<str:tag>/', ArticleByTagListView.as_view(), name='articles_by_tags'),
     path('category/<slug:slug>/', ArticleByCategoryListView.as_view(), name="articles_by_category"),
     path('search/', ArticleSearchResultView.as_view(), name='search'),
     path('rating/', RatingCreateView.as_view(), name='rating'),
+    path('fragments/', PageFragmentsView.as_view(), name='page_fragments'),
 
 ]
\ No newline at end of file
@@ -1,29 +1,39 @@
-from random import shuffle
+from random import sample
+from pathlib import Path
 
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
-from django.http import JsonResponse
-from django.db.models import Count
-from django.db.models.query import QuerySet
+from django.http import JsonResponse, FileResponse, Http404
+from django.middleware.csrf import get_token
 from django.shortcuts import redirect
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy
-
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import ensure_csrf_cookie
 
 from typing import Any
 
-from .models import Article, Category, Comment, Rating
+from .models import Article, ArticleSimilarity, Comment, Rating
 from .forms import ArticleCreateForm, ArticleUpdateForm, CommentCreateForm
 
-from ..services.mixins import AuthorRequiredMixin, CountViewerMixin
+from ..services.mixins import AuthorRequiredMixin, CountViewerMixin, KeysetPaginationMixin, ConditionalGetMixin, PageCacheMixin
 from ..services.utils  import get_client_ip
+from ..services.search import cached_search
+from ..services.timelines import timeline_articles
+from ..services.categories import get_category_snapshot
+from ..services.cache import bump_generation
+from ..services.comments import get_comment_tree, get_comment_threads, get_comment_subtree, resolve_parent, flatten_comments, serialize_comment
 
 from taggit.models import Tag
 
 
 
-class ArticleListView(ListView):
+class ArticleListView(PageCacheMixin, ConditionalGetMixin, KeysetPaginationMixin, ListView):
 
     model = Article
     template_name = 'blog/article_list.html'
@@ -37,23 +47,40 @@ class ArticleListView(ListView):
     
 
 
-class ArticleDetailView(CountViewerMixin, DetailView):
+class ArticleDetailView(PageCacheMixin, ConditionalGetMixin, CountViewerMixin, DetailView):
 
     model = Article
     template_name = 'blog/article_detail.html'
     context_object_name = 'article'
     queryset = model.objects.detail()
+    conditional_generations = ('articles', 'comments', 'categories', 'tags')
+    page_cache_params = ()
+
+    def get_conditional_data(self):
+        article = Article.objects.all()\
+            .filter(slug=self.kwargs['slug'])\
+            .values('pk', 'updated_at', 'rating_sum', 'comment_count')\
+            .first()
+        if article is None:
+            return None
+        self.article_id = article['pk']
+        return article['updated_at'], [article['rating_sum'], article['comment_count']]
+
+    def not_modified(self, request, response):
+        self.count_view(request, Article(pk=self.article_id))
+        return response
+
+    def page_cache_hit(self, request, entry):
+        self.count_view(request, Article(pk=entry['object_id']))
 
     def get_similar_articles(self, obj):
-        article_tags_ids = obj.tags.values_list('id', flat=True)
-        similar_articles = Article.objects\
-            .filter(tags__in=article_tags_ids)\
-            .exclude(id=obj.id)\
-            .annotate(related_tags=Count('tags'))\
-            .order_by('-related_tags')
-        similar_articles_list = list(similar_articles.all())
-        shuffle(similar_articles_list)
-        return similar_articles_list[:6]
+        similar_articles = ArticleSimilarity.objects\
+            .filter(article=obj, similar__status='P')\
+            .select_related('similar')\
+            .only('similar__id', 'similar__title', 'similar__slug')\
+            .order_by('-score')[:settings.SIMILAR_ARTICLES_POOL]
+        similar_articles_list = [similarity.similar for similarity in similar_articles]
+        return sample(similar_articles_list, min(settings.SIMILAR_ARTICLES_COUNT, len(similar_articles_list)))
 
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
@@ -61,11 +88,12 @@ class ArticleDetailView(CountViewerMixin, DetailView):
         context['title'] = self.object.title
         context['form'] = CommentCreateForm
         context['similar_articles'] = self.get_similar_articles(self.object)
+        context['comments'], context['comments_next'] = get_comment_threads(self.object.pk)
         return context
     
 
 
-class ArticleByCategoryListView(ListView):
+class ArticleByCategoryListView(PageCacheMixin, ConditionalGetMixin, KeysetPaginationMixin, ListView):
 
     model = Article
     template_name = 'blog/article_list.html'
@@ -74,8 +102,9 @@ class ArticleByCategoryListView(ListView):
     category = None
     
     def get_queryset(self):
-        self.category = Category.objects.get(slug=self.kwargs['slug'])
-        queryset = Article.objects.filter(category__slug=self.category.slug)
+        snapshot = get_category_snapshot()
+        self.category = snapshot.get(self.kwargs['slug'])
+        queryset = Article.objects.all().filter(category_id__in=snapshot.descendant_ids(self.category))
         return queryset
     
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
@@ -85,7 +114,7 @@ class ArticleByCategoryListView(ListView):
 
 
 
-class ArticleByTagListView(ListView):
+class ArticleByTagListView(PageCacheMixin, ConditionalGetMixin, KeysetPaginationMixin, ListView):
 
     model = Article
     template_name = 'blog/article_list.html'
@@ -105,7 +134,7 @@ class ArticleByTagListView(ListView):
     
 
 
-class ArticleBySignedUser(LoginRequiredMixin, ListView):
+class ArticleBySignedUser(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """
     A view that displays a list of articles by authors that the current user is subscribed to
     """
@@ -117,9 +146,7 @@ class ArticleBySignedUser(LoginRequiredMixin, ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        authors = self.request.user.profile.following.values_list('id', flat=True)
-        queryset = self.model.objects.all().filter(author_id__in=authors)
-        return queryset
+        return timeline_articles(self.request.user)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -199,20 +226,16 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
         comment = form.save(commit=False)
         comment.article_id = self.kwargs.get('pk')
         comment.author = self.request.user
-        comment.parent_id = form.cleaned_data.get('parent')
-        comment.save()
+        if form.cleaned_data.get('parent'):
+            try:
+                comment.parent_id = resolve_parent(comment.article_id, form.cleaned_data['parent'])
+            except Comment.DoesNotExist:
+                form.add_error('parent', 'Comment not found')
+                return self.form_invalid(form)
+        get_comment_tree().insert(comment)
 
         if self.is_ajax():
-            return JsonResponse({
-                'is_child': comment.is_child_node(),
-                'id': comment.id,
-                'author': comment.author.username,
-                'parent_id': comment.parent_id,
-                'created_at': comment.created_at.strftime('%Y-%b-%d %H:%M:%S'),
-                'avatar': comment.author.profile.avatar.url,
-                'content': comment.content,
-                'get_absolute_url': comment.author.profile.get_absolute_url()
-            }, status=200)
+            return JsonResponse(serialize_comment(comment), status=200)
         
         return redirect(comment.article.get_absolute_url())
     
@@ -221,7 +244,41 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
     
 
 
-class ArticleSearchResultView(ListView):
+class CommentThreadView(View):
+    """
+    Further root threads (?after=<cursor>) or the deeper replies of a comment (?parent=<id>) of an article,
+    returned as an HTML fragment together with the comments themselves
+    """
+
+    template_name = 'blog/comments/comments_threads.html'
+
+    def get(self, request, *args, **kwargs):
+        article_id = self.kwargs.get('pk')
+        try:
+            parent_id = int(request.GET['parent']) if 'parent' in request.GET else None
+            after = int(request.GET['after']) if 'after' in request.GET else None
+        except ValueError:
+            return JsonResponse({'error': 'Invalid comment thread'}, status=400)
+
+        next_after = None
+        if parent_id is not None:
+            parent = Comment.objects.filter(pk=parent_id, article_id=article_id).first()
+            if parent is None:
+                return JsonResponse({'error': 'Comment not found'}, status=404)
+            comments = get_comment_subtree(parent)
+        else:
+            comments, next_after = get_comment_threads(article_id, after)
+
+        html = render_to_string(self.template_name, {'comments': comments}, request=request)
+        return JsonResponse({
+            'html': html,
+            'next': next_after,
+            'comments': [serialize_comment(comment) for comment in flatten_comments(comments)],
+        })
+    
+
+
+class ArticleSearchResultView(ConditionalGetMixin, KeysetPaginationMixin, ListView):
     """
     Implementation of search for articles on the site
     """
@@ -232,11 +289,8 @@ class ArticleSearchResultView(ListView):
     allow_empty = True
     template_name = 'blog/article_list.html'
 
-    def get_queryset(self) -> QuerySet[Any]:
-        query = self.request.GET.get('do')
-        search_vector = SearchVector('full_description', weight='B') + SearchVector('title', weight='A')
-        search_query = SearchQuery(query)
-        return (self.model.objects.annotate(rank=SearchRank(search_vector, search_query)).filter(rank__gte=0.3).order_by('-rank'))
+    def get_queryset(self):
+        return cached_search(self.request.GET.get('do', ''))
     
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
@@ -245,40 +299,87 @@ class ArticleSearchResultView(ListView):
     
     """
     The get_queryset() method searches for articles using the full-text search engine from the django.contrib.postgres.search module 
-    in PostgreSQL. To do this, a search vector (search_vector) is formed containing the fields that will be searched, and the weights
-    of each field are set. Then a search query (search_query) is generated based on the user request (query), which was passed 
-    through the GET parameter do. The search is performed using the SearchRank and filter methods of the Article model. The 
-    results are sorted by relevance in reverse order.
+    in PostgreSQL. The search document of every article is stored in the search_vector column (title with weight A, full description 
+    without HTML tags with weight B), it is updated in Article.save() and covered by a GIN index, so the text is not parsed again on 
+    every search. A search query is generated from the user request passed through the GET parameter do, the matching articles are 
+    found with the @@ operator and sorted by SearchRank (ts_rank) in reverse order (modules.services.search.search_articles).
+
+    The ranked ids of the first results are cached in Redis under the normalized query and the current generation of articles, 
+    which is bumped whenever an article is saved or deleted. Only the articles of the requested page are fetched by id, and the 
+    query is counted in the log of popular searches that warm_search_cache_task uses to fill the cache after a deploy.
 
     The get_context_data() method generates a context for displaying found articles in the template.
     """
 
 
-
 class RatingCreateView(View):
 
     model = Rating
 
     def post(self, request, *args, **kwargs):
-        article_id = request.POST.get('article_id')
-        value = int(request.POST.get('value'))
-        ip_address = get_client_ip(request)
-        user = request.user if request.user.is_authenticated else None
-        
-        rating, created = self.model.objects.get_or_create(
-            article_id=article_id,
-            ip_address=ip_address,
-            defaults={'value': value, 'user': user},
-        )
-        
-        if not created:
-            if rating.value == value:
-                rating.delete()
-                return JsonResponse({'status': 'deleted', 'rating_sum': rating.article.get_sum_rating()})
-            else:
-                rating.value = value
-                rating.user = user
-                rating.save()
-                return JsonResponse({'status': 'updated', 'rating_sum': rating.article.get_sum_rating()})
-            
-        return JsonResponse({'status': 'created', 'rating_sum': rating.article.get_sum_rating()})
\ No newline at end of file
+        try:
+            article_id = int(request.POST.get('article_id'))
+            value = int(request.POST.get('value'))
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Invalid rating'}, status=400)
+
+        if value not in (1, -1):
+            return JsonResponse({'error': 'Invalid rating'}, status=400)
+
+        try:
+            status, rating_sum = self.model.objects.toggle(
+                article_id=article_id,
+                ip_address=get_client_ip(request),
+                value=value,
+                user_id=request.user.pk if request.user.is_authenticated else None,
+            )
+        except Article.DoesNotExist:
+            return JsonResponse({'error': 'Article not found'}, status=404)
+
+        if status:
+            bump_generation('ratings')
+        return JsonResponse({'status': status or 'unchanged', 'rating_sum': rating_sum})
+
+
+
+@method_decorator([never_cache, ensure_csrf_cookie], name='dispatch')
+class PageFragmentsView(View):
+    """
+    User-specific parts of a page (login box, messages, CSRF token, rating of the article by the visitor),
+    loaded by backend.js on the pages rendered for anonymous visitors, which may be served from the page cache
+    """
+
+    def get(self, request, *args, **kwargs):
+        rating = None
+        article_id = request.GET.get('article', '')
+        if article_id.isdigit():
+            rating = Rating.objects.filter(article_id=article_id, ip_address=get_client_ip(request)).values_list('value', flat=True).first()
+
+        return JsonResponse({
+            'authenticated': request.user.is_authenticated,
+            'user': render_to_string('includes/user_box.html', request=request),
+            'messages': render_to_string('includes/messages.html', request=request),
+            'csrf_token': get_token(request),
+            'rating': rating,
+        })
+
+
+
+class SitemapView(View):
+    """
+    The sitemap index and its pages are generated to SITEMAP_ROOT by generate_sitemaps_task, they are only read here
+    """
+
+    def get(self, request, *args, **kwargs):
+        path = Path(settings.SITEMAP_ROOT) / f'{self.kwargs["name"]}.xml'
+        if not path.is_file():
+            raise Http404
+
+        modified = int(path.stat().st_mtime)
+        response = get_conditional_response(request, last_modified=modified)
+        if response is not None:
+            return response
+
+        response = FileResponse(path.open('rb'), content_type='application/xml')
+        response.headers['Last-Modified'] = http_date(modified)
+        return response
@@ -0,0 +1,655 @@
+import gzip
+import io
+import json
+import os
+import shutil
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, time, timedelta
+from hashlib import sha256
+from itertools import islice
+from multiprocessing import current_process, get_context
+from pathlib import Path
+from time import perf_counter
+
+import django
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import Max, Q
+from django.db.models.constants import OnConflict
+from django.utils.dateparse import parse_datetime
+
+from .cache import GENERATIONS, bump_generation
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MANIFEST = 'manifest.json'
+MANIFEST_VERSION = 2
+EXTENSIONS = {'gzip': 'jsonl.gz', 'zstd': 'jsonl.zst'}
+MODES = ('auto', 'full', 'incremental')
+# The full backup is loaded into these tables first, the restored tables are replaced in one transaction
+STAGING_PREFIX = 'dbrestore_'
+
+
+
+class BackupEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder cuts the microseconds of times to milliseconds, a backup keeps them
+    """
+
+    def default(self, o):
+        if isinstance(o, (date, time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+
+ENCODER = BackupEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+
+class HashingWriter:
+    """
+    Binary file that counts and hashes the (compressed) bytes written to it, for the checksums of the manifest
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.digest = sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+
+
+def _compressor(writer, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=settings.DBACKUP_COMPRESSION_LEVEL).stream_writer(writer, closefd=False)
+    return gzip.GzipFile(fileobj=writer, mode='wb', compresslevel=settings.DBACKUP_COMPRESSION_LEVEL)
+
+
+def backup_models():
+    """
+    Labels of the models stored in a backup: every concrete table including the tables of many to many fields,
+    without DBACKUP_EXCLUDE
+    """
+
+    return [
+        model._meta.label_lower for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed and not model._meta.proxy and model._meta.label_lower not in settings.DBACKUP_EXCLUDE
+    ]
+
+
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _key_field(model):
+    pk = model._meta.pk
+    return pk.target_field if pk.is_relation else pk
+
+
+def _batches(values, size):
+    values = iter(values)
+    while batch := list(islice(values, size)):
+        yield batch
+
+
+def _write_lines(path, compression, values):
+    """
+    Writing values as compressed JSON lines in chunks, returns the entry of the file in the manifest
+    """
+
+    rows = 0
+    with open(path, 'wb') as file:
+        writer = HashingWriter(file)
+        with _compressor(writer, compression) as stream:
+            for lines in _batches(map(ENCODER.encode, values), settings.DBACKUP_CHUNK_SIZE):
+                stream.write(('\n'.join(lines) + '\n').encode())
+                rows += len(lines)
+    return {'file': path.name, 'rows': rows, 'bytes': writer.size, 'sha256': writer.digest.hexdigest()}
+
+
+def _diff_keys(previous, current):
+    """
+    Merge of two ascending streams of primary keys: yields (key, state), the state is 'inserted' for the keys
+    of current only, 'deleted' for the keys of previous only and 'kept' for the keys of both
+    """
+
+    previous, current = iter(previous), iter(current)
+    old, new = next(previous, None), next(current, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old < new):
+            yield old, 'deleted'
+            old = next(previous, None)
+        elif old is None or new < old:
+            yield new, 'inserted'
+            new = next(current, None)
+        else:
+            yield new, 'kept'
+            old, new = next(previous, None), next(current, None)
+
+
+def dump_model(label, directory, compression, snapshot=None, previous=None):
+    """
+    Streaming the rows of one model with a server side cursor into a compressed JSON lines shard, one array of column
+    values per line, and the primary keys into a second one. With a snapshot the rows are read from the snapshot exported
+    by the process that started the backup, so all shards of a backup show the same moment.
+
+    previous is (directory, compression, manifest entry) of the model in the previous backup of an incremental backup.
+    The keys are compared with the keys of the previous backup: the deleted ones are written to a tombstone shard,
+    and the models of DBACKUP_WATERMARKS and DBACKUP_APPEND_ONLY get only the rows inserted since the previous backup
+    and the rows whose watermark field is not older than the previous watermark (minus DBACKUP_WATERMARK_OVERLAP).
+    Any other model is dumped in full. Returns the entry of the model in the manifest.
+    """
+
+    model = apps.get_model(label)
+    columns = _columns(model)
+    directory = Path(directory)
+    extension = EXTENSIONS[compression]
+    watermark = settings.DBACKUP_WATERMARKS.get(label)
+    integer = isinstance(_key_field(model), models.IntegerField)
+    entry = {'columns': columns, 'partial': False}
+
+    with transaction.atomic():
+        if snapshot:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+                cursor.execute('SET TRANSACTION SNAPSHOT %s', [snapshot])
+
+        rows = model._base_manager.all()
+        keys = model._base_manager.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=settings.DBACKUP_CHUNK_SIZE)
+        if previous is None:
+            entry['keys'] = _write_lines(directory / f'{label}.keys.{extension}', compression, keys)
+        else:
+            previous_directory, previous_compression, previous_entry = previous
+            previous_keys = _read_rows(Path(previous_directory) / previous_entry['keys']['file'], previous_compression)
+            if not integer:
+                # Only integer keys are ordered the same way by the database and by Python, others are sorted here
+                # (models with such keys are small: sessions are not backed up)
+                previous_keys = sorted(previous_keys)
+                keys = sorted(json.loads(ENCODER.encode(key)) for key in keys)
+
+            last_key = previous_entry.get('max_pk')
+            deleted, inserted = [], []
+
+            def current_keys():
+                for key, state in _diff_keys(previous_keys, keys):
+                    if state == 'deleted':
+                        deleted.append(key)
+                        continue
+                    # The keys above the previous maximum are selected by a range, only the others are listed
+                    if state == 'inserted' and (last_key is None or key <= last_key):
+                        inserted.append(key)
+                    yield key
+
+            entry['keys'] = _write_lines(directory / f'{label}.keys.{extension}', compression, current_keys())
+            entry['deleted'] = _write_lines(directory / f'{label}.deleted.{extension}', compression, deleted)
+
+            if (watermark or label in settings.DBACKUP_APPEND_ONLY) and previous_entry['keys']['rows']:
+                changed = Q(pk__in=inserted)
+                if last_key is not None:
+                    changed |= Q(pk__gt=last_key)
+                if watermark and previous_entry.get('watermark'):
+                    since = parse_datetime(previous_entry['watermark']) - timedelta(seconds=settings.DBACKUP_WATERMARK_OVERLAP)
+                    changed |= Q(**{f'{watermark}__gte': since})
+                rows = rows.filter(changed)
+                entry['partial'] = True
+
+        values = rows.order_by('pk').values_list(*columns).iterator(chunk_size=settings.DBACKUP_CHUNK_SIZE)
+        entry = {**_write_lines(directory / f'{label}.{extension}', compression, values), **entry}
+
+        if integer:
+            entry['max_pk'] = model._base_manager.aggregate(value=Max('pk'))['value']
+        if watermark:
+            value = model._base_manager.aggregate(value=Max(watermark))['value']
+            if value:
+                entry['watermark'] = value.isoformat()
+            else:
+                entry['watermark'] = previous[2].get('watermark') if previous else None
+
+    return entry
+
+
+def _init_worker():
+    # Workers are spawned (not forked): they set up Django and open their own database connections
+    django.setup()
+
+
+def _executor(workers):
+    """
+    A pool of worker processes, or None when the backup runs in a daemonic process (a prefork celery worker)
+    that is not allowed to start children, or with a single worker
+    """
+
+    if workers <= 1 or current_process().daemon:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'), initializer=_init_worker)
+
+
+def _previous_backup(mode):
+    """
+    The backup an incremental backup continues from, or None when a full backup is made: in the auto mode
+    when there is no backup yet or the full backup of the chain is DBACKUP_FULL_INTERVAL days old
+    """
+
+    backups = list_backups()
+    manifest = read_manifest(backups[-1]) if backups else None
+    # Backups of the first version have no keys to compare with
+    if manifest is None or manifest.get('version', 1) < MANIFEST_VERSION:
+        if mode == 'incremental':
+            raise ValueError('There is no backup to continue with an incremental backup, a full backup is needed first')
+        return None
+    if mode == 'auto':
+        base = backups[-1].with_name(manifest['base'] or backups[-1].name)
+        if not (base / MANIFEST).exists():
+            return None
+        created_at = datetime.fromisoformat(read_manifest(base)['created_at'])
+        if (date.today() - created_at.date()).days >= settings.DBACKUP_FULL_INTERVAL:
+            return None
+    return backups[-1], manifest
+
+
+def create_backup(workers=None, compression=None, mode='full'):
+    """
+    Writing a backup of all models to a new directory of DBACKUP_DIR. Every model is dumped to its own shard
+    by a pool of DBACKUP_WORKERS processes, all of them reading the snapshot of one REPEATABLE READ transaction.
+    An incremental backup stores only the changes since the previous backup (see dump_model), the auto mode makes
+    a full backup every DBACKUP_FULL_INTERVAL days and incremental backups in between.
+    The directory gets its final name only after the manifest is written, the backups older than the last
+    DBACKUP_RETENTION full backups are removed afterwards. Returns the path of the backup.
+    """
+
+    compression = compression or settings.DBACKUP_COMPRESSION
+    if compression == 'zstd' and zstandard is None:
+        raise ImproperlyConfigured('zstd compression of backups requires the zstandard package')
+
+    previous = None if mode == 'full' else _previous_backup(mode)
+    root = Path(settings.DBACKUP_DIR)
+    created_at = datetime.now()
+    path = root / f'backup-{created_at:%Y-%m-%d-%H-%M-%S}'
+    temporary = path.with_name(f'.{path.name}')
+    temporary.mkdir(parents=True)
+
+    def previous_entry(label):
+        if previous is None or label not in previous[1]['models']:
+            return None
+        return str(previous[0]), previous[1]['compression'], previous[1]['models'][label]
+
+    labels = backup_models()
+    executor = _executor(workers or settings.DBACKUP_WORKERS)
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+                cursor.execute('SELECT pg_export_snapshot()')
+                snapshot = cursor.fetchone()[0]
+
+            if executor is None:
+                shards = {label: dump_model(label, temporary, compression, previous=previous_entry(label)) for label in labels}
+            else:
+                with executor:
+                    futures = {
+                        label: executor.submit(dump_model, label, temporary, compression, snapshot, previous_entry(label))
+                        for label in labels
+                    }
+                    shards = {label: future.result() for label, future in futures.items()}
+    except BaseException:
+        shutil.rmtree(temporary, ignore_errors=True)
+        raise
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'kind': 'full' if previous is None else 'incremental',
+        'created_at': created_at.isoformat(),
+        'compression': compression,
+        'base': None if previous is None else previous[1]['base'] or previous[0].name,
+        'previous': None if previous is None else previous[0].name,
+        'models': shards,
+    }
+    (temporary / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    os.replace(temporary, path)
+    prune_backups()
+    return path
+
+
+def list_backups():
+    """
+    Complete backups of DBACKUP_DIR from the oldest
+    """
+
+    root = Path(settings.DBACKUP_DIR)
+    if not root.exists():
+        return []
+    return sorted(path for path in root.glob('backup-*') if (path / MANIFEST).exists())
+
+
+def prune_backups():
+    """
+    Removing the backups older than the last DBACKUP_RETENTION full backups, an incremental backup is kept
+    as long as the full backup it is based on
+    """
+
+    backups = list_backups()
+    full = [path for path in backups if read_manifest(path).get('kind', 'full') == 'full']
+    if len(full) <= settings.DBACKUP_RETENTION:
+        return
+    oldest = full[-settings.DBACKUP_RETENTION] if settings.DBACKUP_RETENTION else backups[-1]
+    for path in backups:
+        if path < oldest:
+            shutil.rmtree(path)
+
+
+def read_manifest(path):
+    return json.loads((Path(path) / MANIFEST).read_text())
+
+
+def backup_chain(path):
+    """
+    The backups needed to restore a backup from its full backup: [(path, manifest), ...]
+    """
+
+    path = Path(path)
+    chain = [(path, read_manifest(path))]
+    while chain[0][1].get('previous'):
+        previous = path.with_name(chain[0][1]['previous'])
+        if not (previous / MANIFEST).exists():
+            raise FileNotFoundError(f'The backup {previous.name} the incremental backup {chain[0][0].name} is based on is missing')
+        chain.insert(0, (previous, read_manifest(previous)))
+    return chain
+
+
+def verify_backup(path, manifest):
+    """
+    Comparing the checksums of the shards with the manifest, returns the names of the damaged shards
+    """
+
+    damaged = []
+    shards = manifest['models'].values()
+    files = [*shards, *(shard[name] for shard in shards for name in ('keys', 'deleted') if name in shard)]
+    for shard in files:
+        digest = sha256()
+        with open(Path(path) / shard['file'], 'rb') as file:
+            while chunk := file.read(1 << 20):
+                digest.update(chunk)
+        if digest.hexdigest() != shard['sha256']:
+            damaged.append(shard['file'])
+    return damaged
+
+
+def _read_rows(file_path, compression):
+    with open(file_path, 'rb') as file:
+        if compression == 'zstd':
+            stream = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(file), encoding='utf-8')
+        else:
+            stream = io.TextIOWrapper(gzip.GzipFile(fileobj=file, mode='rb'), encoding='utf-8')
+        for line in stream:
+            yield json.loads(line)
+
+
+def _stage(table, fields, objects):
+    row = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    params = [field.get_db_prep_save(getattr(obj, field.attname), connection) for obj in objects for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {table} ({columns}) VALUES {", ".join([row] * len(objects))}', params)
+
+
+def load_models(labels, directory, manifest, tables=None, upsert=False):
+    """
+    Inserting the shards of the given models in one transaction, in batches of multi-row INSERTs, into the tables
+    of the models or into the staging tables given by tables ({label: table}).
+    The inserts are raw (the way loaddata saves objects): the values of auto_now fields are kept as backed up
+    and no signals are sent. Columns missing in the current schema are skipped. Columns added since the backup
+    get the values of the model: the database keeps no defaults, and pre_save fills the auto_now fields.
+    With upsert the rows already stored are updated (ON CONFLICT of the primary key), for incremental backups.
+    Returns {label: (number of rows, seconds)}.
+    """
+
+    loaded = {}
+    with transaction.atomic():
+        for label in labels:
+            started = perf_counter()
+            model = apps.get_model(label)
+            shard = manifest['models'][label]
+            fields = model._meta.concrete_fields
+            attnames = {field.attname for field in fields}
+            indexes = [(index, column) for index, column in enumerate(shard['columns']) if column in attnames]
+            missing = [field for field in fields if field.attname not in shard['columns']]
+            # PostgreSQL accepts at most 65535 parameters per statement
+            batch_size = max(1, min(settings.DBACKUP_CHUNK_SIZE, 65535 // max(len(fields), 1)))
+
+            options = {}
+            if upsert:
+                update_fields = [field for field in fields if field.attname in shard['columns'] and not field.primary_key]
+                options = {'on_conflict': OnConflict.IGNORE}
+                if update_fields:
+                    options = {'on_conflict': OnConflict.UPDATE, 'update_fields': update_fields, 'unique_fields': [model._meta.pk]}
+
+            def build(row):
+                instance = model(**{column: row[index] for index, column in indexes})
+                for field in missing:
+                    setattr(instance, field.attname, field.pre_save(instance, add=True))
+                return instance
+
+            rows = 0
+            values = _read_rows(Path(directory) / shard['file'], manifest['compression'])
+            for batch in _batches(map(build, values), batch_size):
+                if tables:
+                    _stage(tables[label], fields, batch)
+                else:
+                    model._base_manager._insert(batch, fields=fields, raw=True, **options)
+                rows += len(batch)
+            loaded[label] = (rows, perf_counter() - started)
+    return loaded
+
+
+def _load_staging(executor, labels, path, manifest, tables):
+    if executor is None:
+        yield from (load_models([label], path, manifest, tables) for label in labels)
+        return
+    futures = [executor.submit(load_models, [label], path, manifest, tables) for label in labels]
+    yield from (future.result() for future in as_completed(futures))
+
+
+def _create_staging(tables):
+    with connection.cursor() as cursor:
+        for label, table in tables.items():
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+            cursor.execute(f'CREATE UNLOGGED TABLE {table} (LIKE {connection.ops.quote_name(apps.get_model(label)._meta.db_table)})')
+
+
+def _drop_staging(tables):
+    with connection.cursor() as cursor:
+        for table in tables.values():
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def _referencing_models(models):
+    """
+    Models outside of the restore whose foreign keys refer to the restored models
+    """
+
+    return [
+        model for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed and not model._meta.proxy and model not in models
+        and any(field.is_relation and field.related_model in models for field in model._meta.concrete_fields)
+    ]
+
+
+def _flush(models):
+    # Without CASCADE: every table referring to the truncated ones has to be in the list (see restore_backup)
+    tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in models)
+    with connection.cursor() as cursor:
+        cursor.execute(f'TRUNCATE {tables} RESTART IDENTITY')
+
+
+def _reset_sequences(models):
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+def _replay_on_delete(labels, deleted):
+    """
+    The rows referring to deleted rows with on_delete SET_NULL or SET_DEFAULT were changed by an UPDATE that does not
+    touch their watermark, the change is repeated for the rows restored from the older backups
+    """
+
+    for label in labels:
+        model = apps.get_model(label)
+        for field in model._meta.concrete_fields:
+            if not field.is_relation or field.remote_field.on_delete not in (models.SET_NULL, models.SET_DEFAULT):
+                continue
+            keys = deleted.get(field.related_model._meta.label_lower)
+            value = None if field.remote_field.on_delete is models.SET_NULL else field.get_default()
+            for batch in _batches(keys or (), settings.DBACKUP_CHUNK_SIZE):
+                model._base_manager.filter(**{f'{field.attname}__in': batch}).update(**{field.attname: value})
+
+
+def _tree_ids(model, keys):
+    tree_ids = set()
+    for batch in _batches(keys, settings.DBACKUP_CHUNK_SIZE):
+        tree_ids.update(model._base_manager.filter(pk__in=batch).values_list(model._mptt_meta.tree_id_attr, flat=True))
+    return tree_ids
+
+
+def apply_increment(path, manifest, labels, trees):
+    """
+    Replaying an incremental backup in one transaction: the deleted rows are removed, then the rows of the shards
+    are inserted or updated. The ids of the trees of the MPTT models with changed rows are added to trees
+    ({label: set of tree ids}). Returns {label: (number of rows, seconds)}.
+    """
+
+    labels = [label for label in manifest['models'] if label in labels]
+    deleted, changed = {}, {}
+    with transaction.atomic():
+        for label in labels:
+            model = apps.get_model(label)
+            shard = manifest['models'][label]
+            # Models new in the schema since the previous backup are dumped in full, without tombstones
+            deleted[label] = list(_read_rows(Path(path) / shard['deleted']['file'], manifest['compression'])) if 'deleted' in shard else []
+            if shard['partial'] and hasattr(model, '_tree_manager'):
+                index = shard['columns'].index(model._meta.pk.attname)
+                changed[label] = [row[index] for row in _read_rows(Path(path) / shard['file'], manifest['compression'])]
+                # The trees the rows belonged to before the increment (deleted or moved rows) and after it
+                trees.setdefault(label, set()).update(_tree_ids(model, deleted[label] + changed[label]))
+
+            # A raw delete: no cascades collected and no signals, the deleted related rows have tombstones of their own
+            for batch in _batches(deleted[label], settings.DBACKUP_CHUNK_SIZE):
+                model._base_manager.filter(pk__in=batch)._raw_delete(connection.alias)
+
+        loaded = load_models(labels, path, manifest, upsert=True)
+        _replay_on_delete(labels, deleted)
+        for label, keys in changed.items():
+            trees[label].update(_tree_ids(apps.get_model(label), keys))
+    return loaded
+
+
+def _rebuild_trees(models, manifest, trees):
+    """
+    The tree fields of the MPTT models are restored as they were backed up, the trees are rebuilt once at the end
+    only when the backup lacks them (a backup of an older schema). The trees changed by incremental backups
+    are rebuilt one by one: inserts, moves and deletes shift the tree fields of rows that are not backed up again.
+    """
+
+    for model in models:
+        tree_manager = getattr(model, '_tree_manager', None)
+        if tree_manager is None:
+            continue
+        opts = model._mptt_meta
+        label = model._meta.label_lower
+        tree_fields = {opts.left_attr, opts.right_attr, opts.tree_id_attr, opts.level_attr}
+        if label not in manifest['models'] or not tree_fields <= set(manifest['models'][label]['columns']):
+            tree_manager.rebuild()
+            continue
+        for tree_id in sorted(trees.get(label, ())):
+            tree_manager.partial_rebuild(tree_id)
+
+
+def restore_backup(path, workers=None, report=None):
+    """
+    Replacing the data of the models of a backup with the backup. The shards of the full backup are loaded
+    into staging tables by a pool of DBACKUP_WORKERS processes. Then one transaction truncates the restored tables,
+    copies the staging tables into them, replays the incremental backups of the chain up to the given one
+    and resets the sequences, so a failed restore leaves the data as it was. Tables outside of the backup are
+    not touched: the restore is refused while one of them has rows referring to the restored tables.
+    report(label, rows, seconds) is called after every loaded model. Returns the total number of rows.
+    """
+
+    chain = backup_chain(path)
+    for backup, manifest in chain:
+        if manifest['compression'] == 'zstd' and zstandard is None:
+            raise ImproperlyConfigured('zstd compressed backups require the zstandard package')
+        damaged = verify_backup(backup, manifest)
+        if damaged:
+            raise ValueError(f'Checksums of the shards of {backup.name} do not match the manifest: {", ".join(damaged)}')
+
+    # Models removed since the backup are skipped
+    current = {model._meta.label_lower for model in apps.get_models(include_auto_created=True)}
+    labels = list(dict.fromkeys(label for _, manifest in chain for label in manifest['models'] if label in current))
+    models = [apps.get_model(label) for label in labels]
+
+    # The empty ones are truncated together with the restored tables, TRUNCATE requires it
+    referencing = _referencing_models(models)
+    kept = [model._meta.label_lower for model in referencing if model._base_manager.exists()]
+    if kept:
+        raise ValueError(f'Tables outside of the backup refer to the restored tables and have rows: {", ".join(kept)}')
+
+    total = 0
+    (base_path, base), increments = chain[0], chain[1:]
+    tables = {label: f'{STAGING_PREFIX}{index}' for index, label in enumerate(label for label in labels if label in base['models'])}
+    _create_staging(tables)
+    executor = _executor(workers or settings.DBACKUP_WORKERS)
+    try:
+        try:
+            for loaded in _load_staging(executor, list(tables), base_path, base, tables):
+                for label, (rows, seconds) in loaded.items():
+                    total += rows
+                    if report:
+                        report(label, rows, seconds)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        with transaction.atomic():
+            _flush(models + referencing)
+            with connection.cursor() as cursor:
+                for label, table in tables.items():
+                    cursor.execute(f'INSERT INTO {connection.ops.quote_name(apps.get_model(label)._meta.db_table)} SELECT * FROM {table}')
+
+            trees = {}
+            for increment_path, manifest in increments:
+                for label, (rows, seconds) in apply_increment(increment_path, manifest, labels, trees).items():
+                    total += rows
+                    if report:
+                        report(label, rows, seconds)
+
+            _rebuild_trees(models, base, trees)
+            _reset_sequences(models)
+            if increments:
+                # The counters of the articles are updated without touching updated_at, so the restored rows may be older than them
+                call_command('reconcile_counters', stdout=io.StringIO())
+    finally:
+        _drop_staging(tables)
+
+    # Cached pages and fragments were built from the replaced data
+    for name in GENERATIONS:
+        bump_generation(name)
+    return total
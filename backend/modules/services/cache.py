@@ -0,0 +1,87 @@
+from time import monotonic, sleep, time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Groups of cached data invalidated by bump_generation
+GENERATIONS = ('articles', 'categories', 'tags', 'comments', 'ratings')
+
+
+def generation_key(name):
+    return f'generation-{name}'
+
+
+def get_generation(name):
+    """
+    Current generation of a group of cached data, it is part of the cache keys of this data
+    """
+
+    key = generation_key(name)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, 1, timeout=None)
+        generation = cache.get(key, 1)
+    return generation
+
+
+def bump_generation(name):
+    """
+    Invalidate a group of cached data at once: the entries built for the previous generation are no longer read
+    and expire by themselves
+    """
+
+    key = generation_key(name)
+    cache.add(key, 1, timeout=None)
+    cache.set(f'{key}-modified', time(), timeout=None)
+    return cache.incr(key)
+
+
+def get_generations(names):
+    """
+    Current generations of several groups with one cache read, and the time of the last bump of any of them
+    """
+
+    keys = [generation_key(name) for name in names]
+    values = cache.get_many(keys + [f'{key}-modified' for key in keys])
+    versions = [values.get(key) or get_generation(name) for name, key in zip(names, keys)]
+    modified = max((values[f'{key}-modified'] for key in keys if f'{key}-modified' in values), default=None)
+    return versions, modified
+
+
+
+def get_or_build(key, builder, generations=(), timeout=None):
+    """
+    Cached value protected against stampedes. The key is versioned by the generations of the data it depends on.
+    After its soft timeout the stale value is still served while a single process rebuilds it,
+    and on a cold miss only the process holding the lock builds the value, the others wait for it for a short time
+    and then build it themselves. Only the process that took the lock releases it.
+    """
+
+    timeout = timeout or settings.FRAGMENT_CACHE_TIMEOUT
+    if generations:
+        key = '-'.join([key] + [str(version) for version in get_generations(generations)[0]])
+    lock_key = f'{key}-lock'
+
+    entry = cache.get(key)
+    if entry is not None and entry['expires'] > time():
+        return entry['value']
+
+    acquired = cache.add(lock_key, 1, settings.FRAGMENT_CACHE_LOCK_TIMEOUT)
+    if not acquired:
+        if entry is not None:
+            return entry['value']
+        deadline = monotonic() + settings.FRAGMENT_CACHE_WAIT
+        while monotonic() < deadline:
+            sleep(0.02)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry['value']
+
+    try:
+        value = builder()
+        cache.set(key, {'value': value, 'expires': time() + timeout}, timeout + settings.FRAGMENT_CACHE_GRACE)
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+    return value
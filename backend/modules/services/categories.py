@@ -0,0 +1,61 @@
+from threading import Lock
+
+from django.http import Http404
+
+from ..blog.models import Category
+
+from .cache import get_generation
+
+
+_lock = Lock()
+_snapshot = None
+
+
+
+class CategorySnapshot:
+    """
+    Process-local copy of the category tree, one query per generation of categories
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.nodes = list(Category.objects.order_by('tree_id', 'lft'))
+        self.by_slug = {}
+        for node in self.nodes:
+            self.by_slug.setdefault(node.slug, node)
+        self._descendants = {}
+
+    def get(self, slug):
+        try:
+            return self.by_slug[slug]
+        except KeyError:
+            raise Http404(f'Category {slug} does not exist')
+
+    def descendant_ids(self, category):
+        """
+        Ids of the category and all its subcategories: the nodes of the same tree within its lft/rght range
+        """
+
+        if category.pk not in self._descendants:
+            self._descendants[category.pk] = [
+                node.pk for node in self.nodes
+                if node.tree_id == category.tree_id and category.lft <= node.lft and node.rght <= category.rght
+            ]
+        return self._descendants[category.pk]
+
+
+def get_category_snapshot():
+    """
+    The snapshot is rebuilt when the generation of categories (bumped on every change of a category) differs from its own
+    """
+
+    global _snapshot
+
+    version = get_generation('categories')
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = CategorySnapshot(version)
+            snapshot = _snapshot
+    return snapshot
@@ -0,0 +1,174 @@
+from django.conf import settings
+from django.db.models.functions import Length
+
+from ..blog.models import Comment
+
+
+def _comments():
+    return Comment.objects.select_related('author', 'author__profile')
+
+
+def _build_tree(comments, max_depth, has_replies):
+    """
+    Linking the comments read in depth-first order to their parents (comment.replies),
+    the comments on max_depth whose replies were not read are marked with comment.has_hidden_replies
+    """
+
+    nodes = {}
+    roots = []
+    for comment in comments:
+        comment.replies = []
+        comment.has_hidden_replies = comment.tree_depth == max_depth and has_replies(comment)
+        nodes[comment.pk] = comment
+        parent = nodes.get(comment.parent_id)
+        if parent is not None:
+            parent.replies.append(comment)
+        else:
+            roots.append(comment)
+    return roots
+
+
+
+class MPTTCommentTree:
+    """
+    Nested sets of django-mptt: reads are lft/rght ranges, every insert shifts lft/rght of the rest of the tree
+    """
+
+    def insert(self, comment):
+        comment.save()
+
+    def _tree(self, comments, max_depth):
+        for comment in comments:
+            comment.tree_depth = comment.level
+        return _build_tree(comments, max_depth, lambda comment: not comment.is_leaf_node())
+
+    def threads(self, article_id, after, count, depth):
+        roots = Comment.objects.filter(article_id=article_id, level=0)
+        if after is not None:
+            roots = roots.filter(tree_id__gt=after)
+        tree_ids = list(roots.order_by('tree_id').values_list('tree_id', flat=True)[:count + 1])
+
+        next_after = tree_ids[count - 1] if len(tree_ids) > count else None
+        comments = _comments().filter(tree_id__in=tree_ids[:count], level__lt=depth).order_by('tree_id', 'lft')
+        return self._tree(list(comments), depth - 1), next_after
+
+    def subtree(self, comment, depth):
+        comments = _comments().filter(
+            tree_id=comment.tree_id,
+            lft__gt=comment.lft,
+            rght__lt=comment.rght,
+            level__lte=comment.level + depth,
+        ).order_by('lft')
+        return self._tree(list(comments), comment.level + depth)
+
+
+
+class PathCommentTree:
+    """
+    Materialized path: reads are prefix ranges of the (article, path) index, an insert writes only its own row
+    """
+
+    def insert(self, comment):
+        with Comment.objects.disable_mptt_updates():
+            comment.save()
+
+    def _tree(self, comments, max_depth):
+        for comment in comments:
+            comment.tree_depth = comment.depth
+        boundary = [comment.pk for comment in comments if comment.tree_depth == max_depth]
+        parents = set(Comment.objects.filter(parent_id__in=boundary).values_list('parent_id', flat=True).distinct()) if boundary else set()
+        return _build_tree(comments, max_depth, lambda comment: comment.pk in parents)
+
+    def threads(self, article_id, after, count, depth):
+        roots = Comment.objects.filter(article_id=article_id, parent__isnull=True)
+        if after is not None:
+            roots = roots.filter(pk__gt=after)
+        root_ids = list(roots.order_by('pk').values_list('pk', flat=True)[:count + 1])
+
+        next_after = root_ids[count - 1] if len(root_ids) > count else None
+        root_ids = root_ids[:count]
+        if not root_ids:
+            return [], None
+
+        comments = _comments()\
+            .annotate(path_length=Length('path'))\
+            .filter(
+                article_id=article_id,
+                path__gte=Comment.path_segment(root_ids[0]),
+                path__lt=Comment.path_segment(root_ids[-1] + 1),
+                path_length__lte=depth * Comment.PATH_STEP,
+            )\
+            .order_by('path')
+        return self._tree(list(comments), depth - 1), next_after
+
+    def subtree(self, comment, depth):
+        comments = _comments()\
+            .annotate(path_length=Length('path'))\
+            .filter(
+                article_id=comment.article_id,
+                path__startswith=comment.path,
+                path_length__gt=len(comment.path),
+                path_length__lte=len(comment.path) + depth * Comment.PATH_STEP,
+            )\
+            .order_by('path')
+        return self._tree(list(comments), comment.depth + depth)
+
+
+
+COMMENT_TREE_BACKENDS = {
+    'mptt': MPTTCommentTree,
+    'path': PathCommentTree,
+}
+
+
+def get_comment_tree(backend=None):
+    return COMMENT_TREE_BACKENDS[backend or settings.COMMENT_TREE_BACKEND]()
+
+
+def get_comment_threads(article_id, after=None):
+    """
+    A page of root threads of the article, each read to COMMENT_THREAD_DEPTH levels.
+    Returns the root comments (their replies are in comment.replies) and the cursor of the next page.
+    """
+
+    return get_comment_tree().threads(article_id, after, settings.COMMENT_THREADS_PER_PAGE, settings.COMMENT_THREAD_DEPTH)
+
+
+def get_comment_subtree(comment):
+    """
+    Replies of a comment to COMMENT_THREAD_DEPTH levels below it
+    """
+
+    return get_comment_tree().subtree(comment, settings.COMMENT_THREAD_DEPTH)
+
+
+def resolve_parent(article_id, parent_id):
+    """
+    The comment a reply is attached to: replies to the comments on the deepest level of a thread
+    become their siblings. Raises Comment.DoesNotExist for comments of other articles.
+    """
+
+    parent = Comment.objects.filter(pk=parent_id, article_id=article_id).values('parent_id', 'path').get()
+    if len(parent['path']) >= Comment.PATH_STEP * Comment.PATH_MAX_DEPTH:
+        return parent['parent_id']
+    return parent_id
+
+
+def flatten_comments(comments):
+    for comment in comments:
+        yield comment
+        yield from flatten_comments(comment.replies)
+
+
+def serialize_comment(comment):
+    return {
+        'is_child': comment.parent_id is not None,
+        'id': comment.id,
+        'author': comment.author.username,
+        'parent_id': comment.parent_id,
+        'created_at': comment.created_at.strftime('%Y-%b-%d %H:%M:%S'),
+        'avatar': comment.author.profile.get_avatar_small,
+        'content': comment.content,
+        'get_absolute_url': comment.author.profile.get_absolute_url(),
+        'has_hidden_replies': getattr(comment, 'has_hidden_replies', False),
+    }
@@ -0,0 +1,31 @@
+from hashlib import md5
+
+from django.db.models import Max
+
+from ..blog.models import Article
+
+from .cache import get_generations, get_or_build
+
+
+def get_articles_updated_at():
+    """
+    Time of the last change of a published article, cached until the next article is saved or deleted
+    """
+
+    def build():
+        return Article.objects.filter(status='P').aggregate(updated_at=Max('updated_at'))['updated_at']
+
+    return get_or_build('articles-updated-at', build, generations=('articles',))
+
+
+def get_validators(generations, updated_at=None, *parts):
+    """
+    ETag and Last-Modified (a timestamp) of a response built from the given data: the time of the last change
+    of the rows shown, the generations of the cached groups the response depends on and any other parts.
+    The time of the last change is part of the ETag as well, so the ETag is not repeated after the cache is flushed.
+    """
+
+    versions, modified = get_generations(generations)
+    etag = md5(repr((updated_at, versions, parts)).encode()).hexdigest()
+    timestamps = [value for value in (updated_at and updated_at.timestamp(), modified) if value]
+    return f'"{etag}"', int(max(timestamps)) if timestamps else None
@@ -0,0 +1,160 @@
+import os
+
+from hashlib import md5
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from PIL import Image, ImageOps, ImageSequence
+
+from ..blog.models import Article
+from ..system.models import Profile
+
+from .cache import bump_generation
+
+
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+INITIALS_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 100 100">'
+    '<rect width="100" height="100" fill="hsl({hue}, 45%, 55%)"/>'
+    '<text x="50" y="50" dy=".35em" fill="#fff" font-family="sans-serif" font-size="40" text-anchor="middle">{initials}</text>'
+    '</svg>'
+)
+
+
+def _resize_frames(image, width):
+    height = max(1, round(image.height * width / image.width))
+    frames = []
+    for frame in ImageSequence.Iterator(image):
+        frame = frame.convert('RGBA').resize((width, height), Image.LANCZOS)
+        frame.info['duration'] = frame.info.get('duration', image.info.get('duration', 100))
+        frames.append(frame)
+    return frames
+
+
+def render_variant(image, width, image_format):
+    """
+    One resized copy of the image. WebP keeps every frame of an animated image, JPEG gets the first frame only.
+    """
+
+    output = BytesIO()
+    options = FORMATS[image_format]
+    if image_format == 'webp' and getattr(image, 'is_animated', False):
+        frames = _resize_frames(image, width)
+        frames[0].save(
+            output, save_all=True, append_images=frames[1:], loop=image.info.get('loop', 0),
+            duration=[frame.info['duration'] for frame in frames], **options
+        )
+    else:
+        image.seek(0)
+        frame = ImageOps.exif_transpose(image).convert('RGBA' if image_format == 'webp' else 'RGB')
+        frame = frame.resize((width, max(1, round(frame.height * width / frame.width))), Image.LANCZOS)
+        frame.save(output, **options)
+    return output.getvalue()
+
+
+def render_thumbnail_variants(name):
+    """
+    Rendering the variants of an uploaded thumbnail: every width of THUMBNAIL_WIDTHS that is smaller than
+    the upload (or the width of the upload if it is narrower than all of them) in every format.
+    Returns the dimensions of the upload and the variants {format: [{'width', 'name'}, ...]} from the narrowest.
+    """
+
+    with default_storage.open(name) as file, Image.open(file) as image:
+        image.load()
+        width, height = ImageOps.exif_transpose(image).size if not getattr(image, 'is_animated', False) else image.size
+        widths = [size for size in settings.THUMBNAIL_WIDTHS if size < width] or [width]
+
+        root, _ = os.path.splitext(name)
+        variants = {}
+        for image_format in FORMATS:
+            variants[image_format] = []
+            for size in widths:
+                content = render_variant(image, size, image_format)
+                variant_name = default_storage.save(f'{root}-{size}.{EXTENSIONS[image_format]}', ContentFile(content))
+                variants[image_format].append({'width': size, 'name': variant_name})
+    return width, height, variants
+
+
+def process_thumbnail(article_id, name, obsolete=()):
+    """
+    Rendering the variants of the current thumbnail of an article and removing the variants of the previous one.
+    The result is stored only if the article still has the same thumbnail.
+    """
+
+    for variant_name in obsolete:
+        default_storage.delete(variant_name)
+    if not name:
+        return None
+
+    width, height, variants = render_thumbnail_variants(name)
+    updated = Article.objects.filter(pk=article_id, thumbnail=name).update(
+        thumbnail_width=width,
+        thumbnail_height=height,
+        thumbnail_variants=variants,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        for variant_name in (variant['name'] for format_variants in variants.values() for variant in format_variants):
+            default_storage.delete(variant_name)
+        return None
+
+    bump_generation('articles')
+    return variants
+
+
+def render_avatar_variants(name):
+    """
+    Square crops of an uploaded avatar in WebP, one for every size of AVATAR_SIZES: {size name: file name}
+    """
+
+    with default_storage.open(name) as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image).convert('RGBA')
+        root, _ = os.path.splitext(name)
+        variants = {}
+        for size_name, size in settings.AVATAR_SIZES.items():
+            output = BytesIO()
+            ImageOps.fit(image, (size, size), Image.LANCZOS).save(output, **FORMATS['webp'])
+            variants[size_name] = default_storage.save(f'{root}-{size}.webp', ContentFile(output.getvalue()))
+    return variants
+
+
+def process_avatar(profile_id, name, obsolete=()):
+    """
+    Rendering the variants of the current avatar of a profile and removing the variants of the previous one.
+    The result is stored only if the profile still has the same avatar.
+    """
+
+    for variant_name in obsolete:
+        default_storage.delete(variant_name)
+    if not name:
+        return None
+
+    variants = render_avatar_variants(name)
+    if not Profile.objects.filter(pk=profile_id, avatar=name).update(avatar_variants=variants):
+        for variant_name in variants.values():
+            default_storage.delete(variant_name)
+        return None
+
+    bump_generation('comments')
+    return variants
+
+
+def render_initials_avatar(slug):
+    """
+    SVG avatar of the profiles without an upload: the first letters of the slug on a background whose hue
+    is derived from the slug, so every user keeps the same colour
+    """
+
+    words = [word for word in slug.replace('_', '-').split('-') if word] or ['?']
+    initials = ''.join(word[0] for word in words[:2]).upper()
+    hue = int(md5(slug.encode()).hexdigest()[:4], 16) % 360
+    return INITIALS_SVG.format(size=max(settings.AVATAR_SIZES.values()), hue=hue, initials=escape(initials))
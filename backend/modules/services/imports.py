@@ -0,0 +1,230 @@
+import csv
+import json
+
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from taggit.models import Tag, TaggedItem
+
+from ..blog.models import Article, Category, article_search_vector
+
+from .cache import bump_generation
+from .tags import rebuild_tag_popularity
+from .tasks import process_thumbnails_task, rebuild_follower_timelines_task, rebuild_similarity_index_task
+from .utils import unique_slugify_batch
+
+
+User = get_user_model()
+CATEGORY_SEPARATOR = '/'
+# Codes and names of the statuses, case insensitive
+STATUSES = {key.lower(): code for code, name in Article.STATUS_OPTIONS for key in (code, name)}
+TEXT_FIELDS = ('title', 'slug', 'short_description', 'full_description', 'thumbnail')
+
+DATES_SQL = '''
+    UPDATE {table} AS article SET created_at = dates.created_at, updated_at = dates.created_at
+    FROM unnest(%s::bigint[], %s::timestamptz[]) AS dates(id, created_at)
+    WHERE article.id = dates.id
+'''
+
+
+def read_records(file, file_format):
+    """
+    Records of the input one by one: JSON lines, or CSV with a header (tags separated by commas).
+    None stands for a line that is not valid JSON, the importer skips it.
+    """
+
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def chunked(records, size):
+    records = iter(records)
+    while chunk := list(islice(records, size)):
+        yield chunk
+
+
+
+class ArticleImporter:
+    """
+    Importing articles in chunks with bulk inserts: every chunk is one transaction with a fixed number of queries.
+    Authors, categories and tags are looked up once and kept for the next chunks, missing categories and tags are created.
+
+    A record has the keys: title, short_description, full_description, author (username), category (titles of the path
+    separated by "/"), tags (list or comma separated), and optionally slug, status, fixed, created_at, thumbnail
+    (name of a file already in the media storage).
+
+    bulk_create skips Article.save and the signals, so the work done there is repeated here per chunk (slugs, rendered text,
+    search vector) or once in finish (tag popularity, caches, similar articles, timelines of the followers of the authors).
+    The references to uploaded files are recounted by collect_uploads_task before any file is collected.
+    """
+
+    def __init__(self, default_author=None):
+        self.default_author = default_author
+        self.authors = {}
+        self.categories = {}
+        self.tags = dict(Tag.objects.values_list('name', 'id'))
+        self.content_type = ContentType.objects.get_for_model(Article)
+        self.imported = 0
+        self.skipped = 0
+        # Authors of the imported published articles, their followers get the articles in their timelines
+        self.published_authors = set()
+        self._load_categories()
+
+    def _load_categories(self):
+        rows = {row['id']: row for row in Category.objects.values('id', 'title', 'parent_id')}
+
+        def path(category_id):
+            row = rows[category_id]
+            return (path(row['parent_id']) if row['parent_id'] else ()) + (row['title'],)
+
+        self.categories = {path(category_id): category_id for category_id in rows}
+
+    def _resolve_authors(self, records):
+        usernames = (record.get('author') or self.default_author for record in records)
+        usernames = {username for username in usernames if isinstance(username, str)} - set(self.authors) - {''}
+        self.authors.update(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+    def _resolve_categories(self, paths):
+        """
+        Creating the missing categories of the chunk, parents first. The tree fields are updated once per chunk.
+        """
+
+        paths = set(paths) - set(self.categories) - {()}
+        missing = sorted({path[:depth] for path in paths for depth in range(1, len(path) + 1)} - set(self.categories), key=len)
+        if not missing:
+            return
+
+        slugs = unique_slugify_batch(Category, [path[-1] for path in missing])
+        with Category.objects.delay_mptt_updates():
+            for path, slug in zip(missing, slugs):
+                category = Category(title=path[-1], slug=slug, description='', parent_id=self.categories.get(path[:-1]))
+                category.save()
+                self.categories[path] = category.pk
+
+    def _resolve_tags(self, tag_lists):
+        names = list(dict.fromkeys(name for names in tag_lists for name in names if name not in self.tags))
+        if not names:
+            return
+        slugs = unique_slugify_batch(Tag, names)
+        created = Tag.objects.bulk_create([Tag(name=name, slug=slug) for name, slug in zip(names, slugs)])
+        self.tags.update((tag.name, tag.pk) for tag in created)
+
+    @staticmethod
+    def _split_path(value):
+        return tuple(title.strip() for title in (value or '').split(CATEGORY_SEPARATOR) if title.strip())
+
+    @staticmethod
+    def _parse_time(value):
+        created_at = parse_datetime(value) if value else None
+        if value and created_at is None:
+            raise ValueError(f'Invalid date: {value}')
+        if created_at and timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+        return created_at
+
+    @staticmethod
+    def _split_tags(value):
+        names = value if isinstance(value, list) else (value or '').split(',')
+        if not all(isinstance(name, str) for name in names):
+            raise TypeError('Tags have to be strings')
+        return list(dict.fromkeys(name.strip()[:100] for name in names if name.strip()))
+
+    def _clean(self, record):
+        """
+        The record with its checked values, or None when it is skipped: without a title or a category, with an unknown
+        author or status, with a created_at that does not parse, or with values of the wrong type
+        """
+
+        if not isinstance(record, dict) or any(not isinstance(record.get(key) or '', str) for key in TEXT_FIELDS):
+            return None
+        try:
+            values = {
+                'path': self._split_path(record.get('category')),
+                'author_id': self.authors.get(record.get('author') or self.default_author),
+                'status': STATUSES.get((record.get('status') or 'P').strip().lower()),
+                'created_at': self._parse_time(record.get('created_at')),
+                'tags': self._split_tags(record.get('tags')),
+            }
+        except (AttributeError, TypeError, ValueError):
+            return None
+        if not (record.get('title') and values['path'] and values['author_id'] and values['status']):
+            return None
+        return record, values
+
+    def import_chunk(self, records):
+        """
+        Inserting one chunk of records, returns the number of imported articles
+        """
+
+        received = len(records)
+        with transaction.atomic():
+            self._resolve_authors([record for record in records if isinstance(record, dict)])
+            records = [cleaned for cleaned in map(self._clean, records) if cleaned]
+            self._resolve_categories(values['path'] for _, values in records)
+            self._resolve_tags(values['tags'] for _, values in records)
+
+            slugs = unique_slugify_batch(Article, [record.get('slug') or record['title'] for record, _ in records])
+            articles = []
+            for (record, values), slug in zip(records, slugs):
+                article = Article(
+                    title=record['title'][:255],
+                    slug=slug,
+                    short_description=record.get('short_description') or '',
+                    full_description=record.get('full_description') or '',
+                    author_id=values['author_id'],
+                    category_id=self.categories[values['path']],
+                    status=values['status'],
+                    fixed=str(record.get('fixed', '')).lower() in ('1', 'true'),
+                    thumbnail=record.get('thumbnail') or '',
+                )
+                article.render()
+                articles.append(article)
+            Article.objects.bulk_create(articles)
+            self.published_authors.update(article.author_id for article in articles if article.status == 'P')
+
+            ids = [article.pk for article in articles]
+            Article.objects.filter(pk__in=ids).update(search_vector=article_search_vector())
+
+            # created_at is set on insert (auto_now_add), the original times are written afterwards in one statement
+            dated = [(article.pk, values['created_at']) for (_, values), article in zip(records, articles) if values['created_at']]
+            if dated:
+                with connection.cursor() as cursor:
+                    cursor.execute(DATES_SQL.format(table=Article._meta.db_table), list(map(list, zip(*dated))))
+
+            TaggedItem.objects.bulk_create([
+                TaggedItem(content_type_id=self.content_type.pk, object_id=article.pk, tag_id=self.tags[name])
+                for article, (_, values) in zip(articles, records)
+                for name in values['tags']
+            ])
+
+            thumbnails = [(article.pk, article.thumbnail.name) for article in articles if article.thumbnail]
+            if thumbnails:
+                transaction.on_commit(lambda: process_thumbnails_task.delay(thumbnails))
+
+        self.imported += len(articles)
+        self.skipped += received - len(articles)
+        return len(articles)
+
+    def finish(self):
+        """
+        The work of the signals done once for the whole import
+        """
+
+        rebuild_tag_popularity()
+        for name in ('articles', 'categories', 'tags'):
+            bump_generation(name)
+        rebuild_similarity_index_task.delay()
+        if self.published_authors:
+            rebuild_follower_timelines_task.delay(sorted(self.published_authors))
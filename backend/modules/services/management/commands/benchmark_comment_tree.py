@@ -0,0 +1,77 @@
+from time import perf_counter
+from typing import Any
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from modules.blog.models import Article, Comment
+from modules.services.comments import COMMENT_TREE_BACKENDS, get_comment_tree
+
+
+
+class Rollback(Exception):
+    pass
+
+
+
+class Command(BaseCommand):
+    """
+    Command to compare the comment tree backends: comments are inserted into a deep thread (every comment replies
+    to the previous one, down to the deepest level) and into a wide thread (every comment replies to the root),
+    then the threads are read back.
+    Everything runs in a transaction that is rolled back, so the command can be run against a copy of the production data.
+    """
+
+    help = 'Benchmark insert and read throughput of the comment tree backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=list(COMMENT_TREE_BACKENDS), action='append', help='Backend to measure, all by default')
+        parser.add_argument('--comments', type=int, default=500, help='Number of comments inserted into every thread')
+        parser.add_argument('--reads', type=int, default=200, help='Number of reads of every thread')
+        parser.add_argument('--article', type=int, help='Id of the article the threads are added to, the first article by default')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        article = Article.objects.filter(pk=options['article']).first() if options['article'] else Article.objects.first()
+        if article is None:
+            raise CommandError('There are no articles to add comments to')
+
+        for backend in options['backend'] or list(COMMENT_TREE_BACKENDS):
+            for shape in ('deep', 'wide'):
+                inserted, read = self.measure(get_comment_tree(backend), article, shape, options['comments'], options['reads'])
+                self.stdout.write(f'{backend:>5} {shape:>5}: {inserted:10.1f} inserts/s {read:10.1f} reads/s')
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, the inserted comments were rolled back'))
+
+        """
+        The measurement runs in a single connection, so it shows the cost of one insert but not the waiting of
+        concurrent writers: with MPTT every insert into a thread shifts lft/rght of the thread (and of the trees after it)
+        under a row lock, so parallel replies to one thread are serialized, while a path insert writes only its own row.
+        """
+
+    def measure(self, tree, article, shape, comments, reads):
+        try:
+            with transaction.atomic():
+                root = Comment(article=article, author=article.author, content='Benchmark')
+                tree.insert(root)
+
+                started = perf_counter()
+                parent, depth = root, 0
+                for number in range(comments):
+                    comment = Comment(article=article, author=article.author, content=f'Benchmark {number}', parent=parent)
+                    tree.insert(comment)
+                    depth += 1
+                    if shape == 'deep' and depth < Comment.PATH_MAX_DEPTH - 1:
+                        parent = comment
+                    else:
+                        parent, depth = root, 0
+                inserted = comments / (perf_counter() - started)
+
+                root = Comment.objects.get(pk=root.pk)
+                started = perf_counter()
+                for _ in range(reads):
+                    tree.subtree(root, depth=comments)
+                read = reads / (perf_counter() - started)
+                raise Rollback
+        except Rollback:
+            pass
+        return inserted, read
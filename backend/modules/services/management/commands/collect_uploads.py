@@ -0,0 +1,23 @@
+from typing import Any
+
+from django.core.management import BaseCommand
+
+from modules.services.uploads import collect_uploads, rebuild_upload_references
+
+
+
+class Command(BaseCommand):
+    """
+    Command to delete the editor uploads no article links to, the same collection runs every night in celery beat
+    """
+
+    help = 'Recount the references to uploaded editor files and delete the unreferenced ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, help='Seconds an unreferenced file is kept after its upload, UPLOAD_BLOB_GRACE by default')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        self.stdout.write('Counting references to uploaded files...')
+        referenced = rebuild_upload_references()
+        deleted = collect_uploads(options['grace'])
+        self.stdout.write(self.style.SUCCESS(f'{referenced} files are referenced, {deleted} unreferenced files deleted'))
@@ -1,43 +1,46 @@
-from typing import Any 
-from datetime import datetime
+from typing import Any
 
-from django.core.management import BaseCommand, call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import BaseCommand, CommandError
 
+from modules.services.backups import EXTENSIONS, MODES, create_backup
 
 
-class DatabaseBackupCommand(BaseCommand):
+
+class Command(BaseCommand):
     """
     Command to create a database backup
     """
 
+    help = 'Back up the database to compressed JSON lines shards, one per model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Number of processes dumping the models, DBACKUP_WORKERS by default')
+        parser.add_argument('--compression', choices=list(EXTENSIONS), help='DBACKUP_COMPRESSION by default')
+        parser.add_argument(
+            '--mode', choices=MODES, default='auto',
+            help='auto (default): a full backup every DBACKUP_FULL_INTERVAL days and incremental backups in between'
+        )
+
     def handle(self, *args: Any, **options: Any) -> str | None:
         self.stdout.write('Waiting for database dump...')
-        call_command(
-            'dumpdata',
-            '--natural-foreign',
-            '--natural-primary', 
-            '--exclude=contenttypes', 
-            '--exclude=admin.logentry', 
-            '--indent=4', 
-            f'--output=database-{datetime.now().strftime("%Y-%m-%d-%H-%M-%S")}.json'
-        )
-        self.stdout.write(self.style.SUCCESS('Database successfully backed up'))
+        try:
+            path = create_backup(workers=options['workers'], compression=options['compression'], mode=options['mode'])
+        except (ImproperlyConfigured, ValueError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(f'Database successfully backed up to {path}'))
 
         """
-        This code is a custom Django command that performs a JSON backup of a database using the Django dumpdata command.
-
-        The BaseCommand file from the django.core.management module is the base class for creating custom Django commands. 
-        It defines the structure you need to use to create your own team.
-
-        handle() is a required method for all Django custom commands and is called when the command is run.
-
-        call_command() is a built-in Django function that calls other Django commands. In this case, we use call_command() 
-        to call the dumpdata command with parameters that specify which models to exclude from the dump.
-
-        In the parameter f'--output=database-{datetime.now().strftime("%Y-%m-%d-%H-%M-%S")}.json' we specify the file name 
-        for the output JSON -file, including the date and time the file was created.
-
-        The self.stdout.write() method is used to write information to the standard output of the command line. After a 
-        successful database backup, the self.stdout.write() method prints a success message using self.style.SUCCESS(), 
-        which formats the output in green for easier readability.
-        """
\ No newline at end of file
+        Every model is streamed from a server side cursor into its own compressed shard (one JSON array of column values
+        per line), so the memory use does not grow with the data. The shards are written in parallel by worker processes
+        that read the snapshot exported by the transaction of the command, so the backup shows a single moment.
+
+        manifest.json lists the shards with their columns, number of rows, size and sha256 checksum; the backup directory
+        is renamed to its final name only after the manifest is written, so a backup with a manifest is complete.
+
+        An incremental backup is based on the previous backup: every shard of keys is compared with the previous one,
+        the deleted keys are stored as tombstones and the models of DBACKUP_WATERMARKS and DBACKUP_APPEND_ONLY are dumped
+        with the inserted rows and the rows changed since the previous watermark only. The chain of a full backup and
+        its incremental backups is restored by drestore from the last one. The backups older than the last
+        DBACKUP_RETENTION full backups are removed after a successful backup.
+        """
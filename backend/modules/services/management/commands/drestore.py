@@ -0,0 +1,55 @@
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import BaseCommand, CommandError
+
+from modules.services.backups import backup_chain, list_backups, restore_backup
+
+
+
+class Command(BaseCommand):
+    """
+    Command to restore a database backup created by dbackup
+    """
+
+    help = 'Restore the database from a backup of dbackup, the newest one by default'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Directory of the backup, the newest backup of DBACKUP_DIR by default')
+        parser.add_argument('--workers', type=int, help='Number of processes loading the models, DBACKUP_WORKERS by default')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive', help='Do not ask for confirmation')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        backups = list_backups()
+        path = Path(options['path']) if options['path'] else (backups[-1] if backups else None)
+        if path is None:
+            raise CommandError('There are no backups to restore')
+
+        try:
+            chain = backup_chain(path)
+        except FileNotFoundError as error:
+            raise CommandError(error)
+        if len(chain) > 1:
+            self.stdout.write(f'{path.name} is incremental, restoring {chain[0][0].name} and {len(chain) - 1} incremental backups')
+
+        if options['interactive']:
+            answer = input(f'The data of the database will be replaced with the backup {path}. Type "yes" to continue: ')
+            if answer != 'yes':
+                raise CommandError('Restore cancelled')
+
+        self.stdout.write(f'Restoring {path}...')
+        started = perf_counter()
+        try:
+            total = restore_backup(path, workers=options['workers'], report=self.report)
+        except (ImproperlyConfigured, ValueError, FileNotFoundError) as error:
+            raise CommandError(error)
+
+        elapsed = perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Database successfully restored: {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)'
+        ))
+
+    def report(self, label, rows, seconds):
+        self.stdout.write(f'{label:>40}: {rows:>10} rows in {seconds:6.1f}s ({rows / max(seconds, 1e-6):.0f} rows/s)')
@@ -0,0 +1,22 @@
+from typing import Any
+
+from django.core.management import BaseCommand
+
+from modules.services.sitemaps import generate_sitemaps
+
+
+
+class Command(BaseCommand):
+    """
+    Command to write the sitemap to disk, the same job runs in celery beat for the changed pages only
+    """
+
+    help = 'Generate the sitemap index and its pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Render every page, not only the changed ones')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        self.stdout.write('Generating the sitemap...')
+        rendered = generate_sitemaps(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'{rendered} sitemap pages successfully written'))
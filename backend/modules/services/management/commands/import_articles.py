@@ -0,0 +1,54 @@
+import resource
+import sys
+
+from time import perf_counter
+from typing import Any
+
+from django.core.management import BaseCommand, CommandError
+
+from modules.services.imports import ArticleImporter, chunked, read_records
+
+
+
+class Command(BaseCommand):
+    """
+    Command to import articles from a JSON lines or CSV file (- for the standard input).
+    The input is streamed and inserted in chunks, the memory use depends on the chunk size, not on the size of the file.
+    """
+
+    help = 'Import articles in bulk from JSON lines or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the file, - for the standard input')
+        parser.add_argument('--format', choices=('jsonl', 'csv'), help='Format of the input, by the file extension by default')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of records inserted in one transaction')
+        parser.add_argument('--author', help='Username of the author of the records without one')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        try:
+            file = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
+
+        importer = ArticleImporter(default_author=options['author'])
+        started = perf_counter()
+        try:
+            with file:
+                for chunk in chunked(read_records(file, file_format), options['chunk_size']):
+                    importer.import_chunk(chunk)
+                    self.stdout.write(self.progress(importer, started))
+        finally:
+            # The chunks committed before an error are finished as well
+            importer.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f'{importer.imported} articles successfully imported, {importer.skipped} records skipped. {self.progress(importer, started)}'
+        ))
+
+    @staticmethod
+    def progress(importer, started):
+        elapsed = perf_counter() - started
+        # ru_maxrss is in kilobytes on Linux
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return f'{importer.imported} articles in {elapsed:.1f}s ({importer.imported / elapsed:.0f}/s), peak memory {peak_memory:.0f} MB'
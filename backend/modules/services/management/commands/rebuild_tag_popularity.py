@@ -0,0 +1,19 @@
+from typing import Any
+
+from django.core.management import BaseCommand
+
+from modules.services.tags import rebuild_tag_popularity
+
+
+
+class Command(BaseCommand):
+    """
+    Command to backfill the tag popularity table, the same rebuild runs every night in celery beat
+    """
+
+    help = 'Recalculate the number of published articles per tag'
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        self.stdout.write('Counting tags of published articles...')
+        rebuild_tag_popularity()
+        self.stdout.write(self.style.SUCCESS('Tag popularity successfully rebuilt'))
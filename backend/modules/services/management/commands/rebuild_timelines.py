@@ -0,0 +1,31 @@
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+
+from modules.services.timelines import rebuild_timeline
+
+
+User = get_user_model()
+
+
+
+class Command(BaseCommand):
+    """
+    Command to rebuild the subscription timelines stored in Redis
+    """
+
+    help = 'Rebuild the timelines of all users or of the given users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int, help='Ids of the users, all users with subscriptions by default')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        user_ids = options['user_ids'] or User.objects.filter(profile__following__isnull=False).distinct().values_list('id', flat=True)
+
+        rebuilt = 0
+        for user_id in user_ids:
+            rebuild_timeline(user_id)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Timelines of {rebuilt} users successfully rebuilt'))
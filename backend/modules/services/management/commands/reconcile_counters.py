@@ -0,0 +1,46 @@
+from typing import Any
+
+from django.core.management import BaseCommand
+from django.db.models import Count, Sum, Min, Max, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
+
+from modules.blog.models import Article, Rating, Comment
+
+
+
+class Command(BaseCommand):
+    """
+    Command to backfill and reconcile the denormalized Article counters (view_count, rating_sum, comment_count)
+    """
+
+    help = 'Recalculate view, rating and comment counters of articles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of articles updated per statement')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        batch_size = options['batch_size']
+        views = Article.viewers.through.objects.filter(article_id=OuterRef('pk')).values('article_id').annotate(total=Count('*')).values('total')
+        ratings = Rating.objects.filter(article_id=OuterRef('pk')).values('article_id').annotate(total=Sum('value')).values('total')
+        # The TreeManager of comments orders by (tree_id, lft), that ordering would end up in the GROUP BY
+        comments = Comment.objects.filter(article_id=OuterRef('pk')).order_by().values('article_id').annotate(total=Count('*')).values('total')
+
+        bounds = Article.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            self.stdout.write('There are no articles')
+            return
+        self.stdout.write('Reconciling article counters...')
+
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            Article.objects.filter(pk__gte=start, pk__lt=start + batch_size).update(
+                view_count=Coalesce(Subquery(views, output_field=IntegerField()), 0),
+                rating_sum=Coalesce(Subquery(ratings, output_field=IntegerField()), 0),
+                comment_count=Coalesce(Subquery(comments, output_field=IntegerField()), 0),
+            )
+
+        self.stdout.write(self.style.SUCCESS('Article counters successfully reconciled'))
+
+        """
+        Each batch is a single UPDATE over a primary key range, the counters are taken from correlated subqueries,
+        so the command can run on a live database and also serves as the initial backfill after the migration.
+        """
@@ -0,0 +1,34 @@
+from typing import Any
+
+from django.core.management import BaseCommand
+
+from modules.system.models import Profile
+from modules.services.images import process_avatar
+
+
+
+class Command(BaseCommand):
+    """
+    Command to backfill the small and medium variants of avatars, new uploads are processed by process_avatar_task
+    """
+
+    help = 'Render the small and medium variants of avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help='Only profiles without variants')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        profiles = Profile.objects.exclude(avatar='')
+        if options['missing']:
+            profiles = profiles.filter(avatar_variants={})
+        self.stdout.write('Rendering avatars...')
+
+        rendered = 0
+        for profile_id, name in profiles.values_list('id', 'avatar').iterator(chunk_size=100):
+            try:
+                process_avatar(profile_id, name)
+                rendered += 1
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'Profile {profile_id}: {error}')
+
+        self.stdout.write(self.style.SUCCESS(f'Avatars of {rendered} profiles successfully rendered'))
@@ -0,0 +1,34 @@
+from typing import Any
+
+from django.core.management import BaseCommand
+
+from modules.blog.models import Article
+from modules.services.images import process_thumbnail
+
+
+
+class Command(BaseCommand):
+    """
+    Command to backfill the resized variants of article thumbnails, new uploads are processed by process_thumbnail_task
+    """
+
+    help = 'Render the resized variants of article thumbnails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help='Only articles without variants')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        articles = Article.objects.exclude(thumbnail='')
+        if options['missing']:
+            articles = articles.filter(thumbnail_variants={})
+        self.stdout.write('Rendering thumbnails...')
+
+        rendered = 0
+        for article_id, name in articles.values_list('id', 'thumbnail').iterator(chunk_size=100):
+            try:
+                process_thumbnail(article_id, name)
+                rendered += 1
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'Article {article_id}: {error}')
+
+        self.stdout.write(self.style.SUCCESS(f'Thumbnails of {rendered} articles successfully rendered'))
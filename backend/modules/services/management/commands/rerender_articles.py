@@ -0,0 +1,23 @@
+from typing import Any
+
+from django.core.management import BaseCommand
+
+from modules.services.rendering import RENDER_VERSION, rerender_articles
+
+
+
+class Command(BaseCommand):
+    """
+    Command to render the stored HTML of the articles after the migration adding it (blog 0010)
+    and again after a change of the pipeline (RENDER_VERSION)
+    """
+
+    help = 'Render the stored HTML, excerpt and number of words of the articles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Render all articles, not only the ones of older versions')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        self.stdout.write(f'Rendering articles with version {RENDER_VERSION} of the pipeline...')
+        rendered = rerender_articles(everything=options['all'])
+        self.stdout.write(self.style.SUCCESS(f'{rendered} articles successfully rendered'))
@@ -0,0 +1,36 @@
+from typing import Any
+
+from django.core.management import BaseCommand
+from django.db.models import Min, Max
+
+from modules.blog.models import Article, article_search_vector
+
+
+
+class Command(BaseCommand):
+    """
+    Command to backfill the stored search documents of articles
+    """
+
+    help = 'Rebuild Article.search_vector for all articles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of articles updated per statement')
+        parser.add_argument('--missing', action='store_true', help='Only articles without a search document')
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        batch_size = options['batch_size']
+        # Article.objects.all() lists published articles only, drafts are indexed too
+        queryset = Article.objects.filter(search_vector__isnull=True) if options['missing'] else Article.objects.filter()
+
+        bounds = queryset.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            self.stdout.write('There are no articles to index')
+            return
+        self.stdout.write('Updating search documents...')
+
+        updated = 0
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            updated += queryset.filter(pk__gte=start, pk__lt=start + batch_size).update(search_vector=article_search_vector())
+
+        self.stdout.write(self.style.SUCCESS(f'Search documents of {updated} articles successfully updated'))
@@ -1,11 +1,27 @@
 from django.contrib.auth.mixins import AccessMixin, UserPassesTestMixin
 from django.core.exceptions import PermissionDenied
 from django.contrib import messages
+from django.contrib.messages import get_messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
 from django.shortcuts import redirect
+from django.conf import settings
+from django.db.models.query import QuerySet
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, urlencode
+
+from hashlib import md5
+
+from redis import RedisError
 
 from ..blog.models import Viewer
 
 from .utils import get_client_ip
+from .viewers import register_view
+from .pagination import KeysetPaginator, InvalidCursor
+from .conditional import get_validators, get_articles_updated_at
+from .cache import get_generations
 
 
 
@@ -38,18 +54,168 @@ class UserIsNotAuthenticated(UserPassesTestMixin):
 
 class CountViewerMixin:
     """
-    Mixin to increase article view count
+    Mixin to increase article view count.
+    In the 'redis' ingestion mode views are buffered and flushed to the database by flush_viewers_task.
     """
 
     def get(self, request, *args, **kwargs):
         response = super().get(request, *args, **kwargs)
         if hasattr(self.object, 'viewers'):
-            viewer, _ = Viewer.objects.get_or_create(
-                user=request.user if request.user.is_authenticated else None,
-                ip_address=get_client_ip(request)
-            )
-
-            if self.object.viewers.filter(id=viewer.id).count() == 0:
-                self.object.viewers.add(viewer)
- 
-        return response
\ No newline at end of file
+            self.count_view(request, self.object)
+        return response
+
+    def count_view(self, request, article):
+        user = request.user if request.user.is_authenticated else None
+        ip_address = get_client_ip(request)
+
+        if settings.VIEWERS_INGESTION == 'redis':
+            try:
+                register_view(article.pk, user.pk if user else None, ip_address)
+                return
+            except RedisError:
+                pass
+
+        viewer, _ = Viewer.objects.get_or_create(user=user, ip_address=ip_address)
+
+        if article.viewers.filter(id=viewer.id).count() == 0:
+            article.viewers.add(viewer)
+
+
+
+class ConditionalGetMixin:
+    """
+    Mixin answering conditional GET requests (If-None-Match, If-Modified-Since) with 304 Not Modified
+    before the queryset and the template are evaluated.
+    The validators are built by get_validators() from conditional_generations and the time of the last change
+    of the data shown, they are personalised by the user and the CSRF cookie that the page is rendered for.
+    """
+
+    conditional_generations = ('articles', 'comments', 'ratings', 'categories', 'tags')
+
+    def get_conditional_data(self):
+        """
+        The time of the last change of the data shown and other parts of the ETag, None disables conditional responses
+        """
+
+        return get_articles_updated_at(), []
+
+    def not_modified(self, request, response):
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+        data = self.get_conditional_data()
+        if data is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        updated_at, parts = data
+        etag, last_modified = get_validators(
+            self.conditional_generations,
+            updated_at,
+            request.user.pk,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+            *parts,
+        )
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return self.not_modified(request, response)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.headers.setdefault('ETag', etag)
+            if last_modified:
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+        return response
+
+
+
+class PageCacheMixin:
+    """
+    Full-page cache of the pages of anonymous visitors (no session and no messages cookie): a hit is answered
+    from Redis without the ORM and the template engine. The key is the path, the query parameters read by the view
+    and the generations of the data shown, so saving or deleting an article, a comment, a category or a tag purges
+    the cached pages. Requests with other query parameters are not cached, they would only fill the cache.
+    The user-specific parts of a page are loaded by the browser from the page_fragments endpoint.
+    """
+
+    page_cache_generations = ('articles', 'comments', 'categories', 'tags')
+    page_cache_params = ('page', 'cursor')
+
+    def is_page_cacheable(self, request):
+        return request.method in ('GET', 'HEAD') \
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES \
+            and CookieStorage.cookie_name not in request.COOKIES \
+            and set(request.GET) <= set(self.page_cache_params)
+
+    def get_page_cache_key(self, request):
+        versions = get_generations(self.page_cache_generations)[0]
+        query = urlencode([(name, request.GET[name]) for name in self.page_cache_params if name in request.GET])
+        path = md5(f'{request.path}?{query}'.encode()).hexdigest()
+        return f'page-{"-".join(str(version) for version in versions)}-{path}'
+
+    def page_cache_hit(self, request, entry):
+        pass
+
+    def cache_page(self, request, key, response):
+        if response.status_code != 200 or request.META.get('CSRF_COOKIE_NEEDS_UPDATE') or response.cookies:
+            return
+        cache.set(key, {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': response.get('ETag'),
+            'last_modified': parse_http_date_safe(response.get('Last-Modified', '')),
+            'object_id': getattr(getattr(self, 'object', None), 'pk', None),
+        }, settings.PAGE_CACHE_TIMEOUT)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_page_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = self.get_page_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            self.page_cache_hit(request, entry)
+            response = get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'])
+            if response is None:
+                response = HttpResponse(entry['content'], content_type=entry['content_type'])
+                if entry['etag']:
+                    response.headers['ETag'] = entry['etag']
+                if entry['last_modified']:
+                    response.headers['Last-Modified'] = http_date(entry['last_modified'])
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, 'add_post_render_callback') and not response.is_rendered:
+            response.add_post_render_callback(lambda rendered: self.cache_page(request, key, rendered))
+        else:
+            self.cache_page(request, key, response)
+        return response
+
+
+
+class KeysetPaginationMixin:
+    """
+    Mixin for list views: cursor pagination over keyset_ordering instead of page numbers.
+    It is used when ARTICLE_PAGINATION is 'keyset' or the request already carries a cursor.
+    """
+
+    keyset_ordering = ('-fixed', '-created_at', 'id')
+    cursor_kwarg = 'cursor'
+
+    def use_keyset_pagination(self, queryset):
+        if not isinstance(queryset, QuerySet):
+            return False
+        return settings.ARTICLE_PAGINATION == 'keyset' or self.cursor_kwarg in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_keyset_pagination(queryset):
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        return (paginator, page, page.object_list, page.has_other_pages())
\ No newline at end of file
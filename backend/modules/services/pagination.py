@@ -0,0 +1,129 @@
+import json
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q, BooleanField
+from django.db.models.expressions import RawSQL
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+
+class KeysetPage:
+    """
+    A page of keyset pagination, the neighbouring pages are addressed by cursors instead of numbers
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+
+class KeysetPaginator:
+    """
+    Pagination that seeks on the ordering columns of the last (or first) row of the current page,
+    so page N costs the same as the first one: there is no OFFSET and no COUNT(*)
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in ordering]
+
+    def encode_cursor(self, obj, direction):
+        values = [field.value_to_string(obj) for field in self.fields]
+        return urlsafe_b64encode(json.dumps([direction, values]).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, values = json.loads(urlsafe_b64decode(cursor.encode()))
+            values = [field.to_python(value) for field, value in zip(self.fields, values, strict=True)]
+        except (ValueError, TypeError, ValidationError) as error:
+            raise InvalidCursor(cursor) from error
+        if direction not in ('next', 'previous'):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def seek(self, values, reverse=False):
+        """
+        Rows after the given values in the ordering (before them if reverse):
+        (a < x) OR (a = x AND b < y) OR (a = x AND b = y AND c > z) for the ordering (-a, -b, c)
+        """
+
+        conditions = []
+        for position, (name, field, value) in enumerate(zip(self.ordering, self.fields, values)):
+            descending = name.startswith('-') != reverse
+            condition = Q(**{f'{field.attname}__{"lt" if descending else "gt"}': value})
+            for previous_field, previous_value in zip(self.fields[:position], values[:position]):
+                condition &= Q(**{previous_field.attname: previous_value})
+            conditions.append(condition)
+        return reduce(or_, conditions)
+
+    def index_condition(self, values, reverse=False):
+        """
+        A row comparison over the leading columns ordered in the same direction, it lets PostgreSQL start the index scan
+        at the cursor instead of filtering every row before it
+        """
+
+        descending = self.ordering[0].startswith('-')
+        prefix = 0
+        while prefix < len(self.ordering) and self.ordering[prefix].startswith('-') == descending:
+            prefix += 1
+
+        table = connection.ops.quote_name(self.queryset.model._meta.db_table)
+        columns = ', '.join(f'{table}.{connection.ops.quote_name(field.column)}' for field in self.fields[:prefix])
+        placeholders = ', '.join(['%s'] * prefix)
+        operator = '<=' if descending != reverse else '>='
+        return RawSQL(f'({columns}) {operator} ({placeholders})', values[:prefix], output_field=BooleanField())
+
+    def page(self, cursor=None):
+        direction, values = self.decode_cursor(cursor) if cursor else ('next', None)
+        reverse = direction == 'previous'
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self.index_condition(values, reverse), self.seek(values, reverse))
+        ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering] if reverse else self.ordering
+
+        object_list = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if reverse:
+            object_list.reverse()
+
+        if not object_list:
+            return KeysetPage(object_list)
+
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else values is not None
+        return KeysetPage(
+            object_list,
+            next_cursor=self.encode_cursor(object_list[-1], 'next') if has_next else None,
+            previous_cursor=self.encode_cursor(object_list[0], 'previous') if has_previous else None,
+        )
@@ -0,0 +1,202 @@
+import re
+
+from dataclasses import dataclass
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.apps import apps
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .cache import bump_generation
+
+
+# Incremented on every change of the output, articles rendered by an older version are rendered again (rerender_articles)
+RENDER_VERSION = 2
+EXCERPT_LENGTH = 300
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'code', 'del', 'div', 'em', 'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'hr', 'i', 'img', 'li', 'mark', 'oembed', 'ol', 'p', 'pre', 's', 'span', 'strong', 'sub', 'sup', 'table', 'tbody', 'td',
+    'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    '*': {'class', 'style'},
+    'a': {'href', 'title', 'target', 'rel'},
+    'img': {'src', 'alt', 'title', 'width', 'height', 'srcset', 'sizes'},
+    # Media embeds of the editor (mediaEmbed), turned into players on the page
+    'oembed': {'url'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'ol': {'start', 'reversed'},
+}
+URL_ATTRIBUTES = {'href', 'src', 'url'}
+# Properties of the style attribute set by the editor (fonts, colours, alignment, indents, image and table properties)
+ALLOWED_STYLES = {
+    'background-color', 'border', 'border-bottom', 'border-color', 'border-left', 'border-right', 'border-style',
+    'border-top', 'border-width', 'color', 'float', 'font-family', 'font-size', 'height', 'list-style-type', 'margin-left',
+    'padding', 'padding-left', 'text-align', 'vertical-align', 'width',
+}
+# Values that load resources or escape the declaration are dropped
+UNSAFE_STYLE_VALUE = re.compile(r'url\s*\(|expression\s*\(|javascript:|[\\<>@]|/\*', re.IGNORECASE)
+URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+# Dropped together with their content, any other unknown tag is dropped and its content kept
+DROPPED_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'svg', 'math'}
+VOID_TAGS = {'br', 'hr', 'img'}
+BLOCK_TAGS = {'p', 'div', 'li', 'br', 'blockquote', 'pre', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'figcaption'}
+
+
+
+@dataclass
+class RenderedHTML:
+    html: str
+    text: str
+    word_count: int
+
+
+
+class ArticleHTMLRenderer(HTMLParser):
+    """
+    One pass over the HTML of the editor: tags and attributes outside of the allow lists and unsafe URLs are removed,
+    images are loaded lazily, links opened in a new tab get rel="noopener", and the plain text is collected
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.text = []
+        self.open_tags = []
+        # The dropped tag and the depth of the tags of the same name nested in it
+        self.dropped_tag = None
+        self.dropped_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self.dropped_tag:
+            self.dropped_depth += tag == self.dropped_tag
+            return
+        if tag in DROPPED_TAGS:
+            self.dropped_tag, self.dropped_depth = tag, 1
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in ALLOWED_TAGS:
+            return
+
+        allowed = ALLOWED_ATTRIBUTES['*'] | ALLOWED_ATTRIBUTES.get(tag, set())
+        attributes = {
+            name: value or '' for name, value in attrs
+            if name in allowed and (name not in URL_ATTRIBUTES or self.is_safe_url(value or ''))
+        }
+        if 'style' in attributes:
+            attributes['style'] = self.clean_style(attributes['style'])
+            if not attributes['style']:
+                del attributes['style']
+        if tag == 'img':
+            attributes.setdefault('loading', 'lazy')
+            attributes.setdefault('decoding', 'async')
+        elif tag == 'a' and attributes.get('target') == '_blank':
+            attributes['rel'] = 'noopener noreferrer'
+
+        self.output.append(f'<{tag}' + ''.join(f' {name}="{escape(value)}"' for name, value in attributes.items()) + '>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.dropped_tag:
+            if tag == self.dropped_tag:
+                self.dropped_depth -= 1
+                if not self.dropped_depth:
+                    self.dropped_tag = None
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in self.open_tags:
+            return
+        # Closing the tags left open inside the closed one, so the stored HTML is always balanced
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.output.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropped_tag:
+            self.output.append(escape(data, quote=False))
+            self.text.append(data)
+
+    @staticmethod
+    def is_safe_url(url):
+        return urlsplit(url.strip()).scheme.lower() in URL_SCHEMES
+
+    @staticmethod
+    def clean_style(style):
+        declarations = []
+        for declaration in style.split(';'):
+            name, _, value = declaration.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name in ALLOWED_STYLES and value and not UNSAFE_STYLE_VALUE.search(value):
+                declarations.append(f'{name}:{value}')
+        return ';'.join(declarations)
+
+    def render(self, source):
+        self.feed(source or '')
+        self.close()
+        self.output.extend(f'</{tag}>' for tag in reversed(self.open_tags))
+        text = ' '.join(''.join(self.text).split())
+        return RenderedHTML(html=''.join(self.output), text=text, word_count=len(text.split()))
+
+
+def render_html(source):
+    return ArticleHTMLRenderer().render(source)
+
+
+def make_excerpt(text):
+    return Truncator(text).chars(EXCERPT_LENGTH)
+
+
+def render_article(article_id):
+    """
+    Rendering a big article in the background. The result is stored only if the text was not changed meanwhile.
+    """
+
+    Article = apps.get_model('blog', 'Article')
+    article = Article.objects.filter(pk=article_id).first()
+    if article is None:
+        return False
+    article.render()
+    updated = Article.objects.filter(pk=article_id, full_description=article.full_description)\
+        .update(updated_at=timezone.now(), **{field: getattr(article, field) for field in Article.RENDERED_FIELDS})
+    if updated:
+        bump_generation('articles')
+    return bool(updated)
+
+
+def rerender_articles(everything=False, batch_size=100):
+    """
+    Rendering the articles rendered by an older version of the pipeline (all articles with everything).
+    Returns the number of rendered articles.
+    """
+
+    Article = apps.get_model('blog', 'Article')
+    # Article.objects.all() lists published articles only, drafts are rendered too
+    articles = Article.objects.filter() if everything else Article.objects.exclude(render_version=RENDER_VERSION)
+    ids = list(articles.order_by('pk').values_list('pk', flat=True))
+
+    for start in range(0, len(ids), batch_size):
+        batch = list(Article.objects.filter(pk__in=ids[start:start + batch_size]))
+        now = timezone.now()
+        for article in batch:
+            article.render()
+            article.updated_at = now
+        # updated_at is written too: the page changed, and incremental backups pick up the articles by it
+        Article.objects.bulk_update(batch, [*Article.RENDERED_FIELDS, 'updated_at'])
+
+    if ids:
+        bump_generation('articles')
+    return len(ids)
@@ -0,0 +1,86 @@
+from hashlib import sha1
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.cache import cache
+from django.db.models import F
+
+from ..blog.models import Article
+
+from .cache import get_generation
+from .utils import IdSequence, get_redis_connection
+
+
+POPULAR_QUERIES_KEY = 'search-popular'
+
+
+def normalize_query(query):
+    """
+    Case and whitespace do not change the result of a search, so they are not part of the cache key
+    """
+
+    return ' '.join((query or '').lower().split())[:settings.SEARCH_QUERY_MAX_LENGTH]
+
+
+def search_articles(query):
+    """
+    Published articles matching the query, the most relevant first
+    """
+
+    search_query = SearchQuery(query, search_type='websearch')
+    return Article.objects.all()\
+        .filter(search_vector=search_query)\
+        .annotate(rank=SearchRank(F('search_vector'), search_query))\
+        .order_by('-rank', '-created_at', 'id')
+
+
+def search_cache_key(query):
+    return f'search-{get_generation("articles")}-{sha1(query.encode()).hexdigest()}'
+
+
+def get_ranked_ids(query):
+    """
+    Ids of the first SEARCH_CACHE_WINDOW results and the total number of results, cached per normalized query
+    """
+
+    key = search_cache_key(query)
+    result = cache.get(key)
+    if result is None:
+        ids = list(search_articles(query).values_list('id', flat=True)[:settings.SEARCH_CACHE_WINDOW])
+        # The total is only counted when the window is full
+        total = search_articles(query).count() if len(ids) == settings.SEARCH_CACHE_WINDOW else len(ids)
+        result = {'ids': ids, 'total': total}
+        cache.set(key, result, settings.SEARCH_CACHE_TIMEOUT)
+    return result['ids'], result['total']
+
+
+def log_query(query):
+    get_redis_connection().zincrby(POPULAR_QUERIES_KEY, 1, query)
+
+
+def cached_search(query):
+    """
+    Search results for ListView pagination, the articles of a page are fetched by id
+    """
+
+    query = normalize_query(query)
+    if not query:
+        return IdSequence(Article.objects.none(), [])
+
+    log_query(query)
+    ids, total = get_ranked_ids(query)
+    return IdSequence(Article.objects.all(), ids, total=total, fallback=search_articles(query))
+
+
+def warm_search_cache(limit=None):
+    """
+    Fill the cache with the results of the most popular queries, the log itself is trimmed to SEARCH_POPULAR_LOG_SIZE
+    """
+
+    redis = get_redis_connection()
+    redis.zremrangebyrank(POPULAR_QUERIES_KEY, 0, -settings.SEARCH_POPULAR_LOG_SIZE - 1)
+    queries = redis.zrevrange(POPULAR_QUERIES_KEY, 0, (limit or settings.SEARCH_WARM_QUERIES) - 1)
+
+    for query in queries:
+        get_ranked_ids(query.decode())
+    return len(queries)
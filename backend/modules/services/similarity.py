@@ -0,0 +1,119 @@
+from collections import defaultdict
+from math import log
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import Count
+
+from taggit.models import TaggedItem
+
+from ..blog.models import Article, ArticleSimilarity
+
+
+TRIM_SQL = '''
+    DELETE FROM {table} WHERE id IN (
+        SELECT id FROM (
+            SELECT id, row_number() OVER (PARTITION BY article_id ORDER BY score DESC, similar_id) AS position
+            FROM {table} WHERE article_id = ANY(%s)
+        ) AS ranked
+        WHERE position > %s
+    )
+'''
+
+
+def _tagged_articles():
+    content_type = ContentType.objects.get_for_model(Article)
+    published = Article.objects.filter(status='P').values('id')
+    return TaggedItem.objects.filter(content_type=content_type, object_id__in=published)
+
+
+def _tag_weights(tag_ids):
+    """
+    Inverse document frequency of tags: rare tags say more about similarity than common ones
+    """
+
+    tagged = _tagged_articles()
+    total = Article.objects.filter(status='P').count()
+    frequencies = tagged.filter(tag_id__in=tag_ids).values('tag_id').annotate(articles=Count('id'))
+    return {row['tag_id']: log((total + 1) / (row['articles'] + 1)) + 1 for row in frequencies}
+
+
+def compute_similar_articles(article_id):
+    """
+    Weighted Jaccard similarity between the article and the articles sharing at least one tag with it.
+    Returns a list of (article id, score) pairs sorted by score.
+    """
+
+    tagged = _tagged_articles()
+    tags = set(tagged.filter(object_id=article_id).values_list('tag_id', flat=True))
+    if not tags:
+        return []
+
+    candidates = tagged.filter(tag_id__in=tags)\
+        .exclude(object_id=article_id)\
+        .values('object_id')\
+        .annotate(shared=Count('id'))\
+        .order_by('-shared')\
+        .values_list('object_id', flat=True)[:settings.SIMILAR_ARTICLES_CANDIDATES]
+
+    candidate_tags = defaultdict(set)
+    for object_id, tag_id in tagged.filter(object_id__in=list(candidates)).values_list('object_id', 'tag_id'):
+        candidate_tags[object_id].add(tag_id)
+
+    weights = _tag_weights(tags.union(*candidate_tags.values()))
+    scores = []
+    for candidate_id, other_tags in candidate_tags.items():
+        shared = sum(weights.get(tag, 0) for tag in tags & other_tags)
+        union = sum(weights.get(tag, 0) for tag in tags | other_tags)
+        if union:
+            scores.append((candidate_id, shared / union))
+
+    scores.sort(key=lambda item: (-item[1], item[0]))
+    return scores
+
+
+def _trim(article_ids):
+    with connection.cursor() as cursor:
+        cursor.execute(TRIM_SQL.format(table=ArticleSimilarity._meta.db_table), [article_ids, settings.SIMILAR_ARTICLES_POOL])
+
+
+def update_article_similarity(article_id):
+    """
+    Incremental update after the tags or the status of an article have changed:
+    the article's own neighbours are recomputed and the article is merged into the lists of its neighbours
+    """
+
+    scores = compute_similar_articles(article_id)
+
+    with transaction.atomic():
+        ArticleSimilarity.objects.filter(article_id=article_id).delete()
+        ArticleSimilarity.objects.filter(similar_id=article_id).exclude(article_id__in=[pk for pk, _ in scores]).delete()
+
+        ArticleSimilarity.objects.bulk_create(
+            [ArticleSimilarity(article_id=article_id, similar_id=pk, score=score) for pk, score in scores[:settings.SIMILAR_ARTICLES_POOL]]
+        )
+        ArticleSimilarity.objects.bulk_create(
+            [ArticleSimilarity(article_id=pk, similar_id=article_id, score=score) for pk, score in scores],
+            update_conflicts=True,
+            unique_fields=['article', 'similar'],
+            update_fields=['score'],
+        )
+        if scores:
+            _trim([pk for pk, _ in scores])
+
+
+def rebuild_similarity_index():
+    """
+    Full rebuild, corrects the drift of tag weights that incremental updates do not propagate
+    """
+
+    article_ids = Article.objects.filter(status='P').values_list('id', flat=True).iterator(chunk_size=1000)
+    for article_id in article_ids:
+        scores = compute_similar_articles(article_id)[:settings.SIMILAR_ARTICLES_POOL]
+        with transaction.atomic():
+            ArticleSimilarity.objects.filter(article_id=article_id).delete()
+            ArticleSimilarity.objects.bulk_create(
+                [ArticleSimilarity(article_id=article_id, similar_id=pk, score=score) for pk, score in scores]
+            )
+    ArticleSimilarity.objects.exclude(article__status='P').delete()
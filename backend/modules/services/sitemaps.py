@@ -0,0 +1,118 @@
+import json
+import os
+
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.db.models import Count, F, Max
+from django.urls import reverse
+
+from ..blog.models import Article
+from ..blog.sitemaps import ArticleSitemap, StaticSitemap
+
+
+URLSET_OPEN = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = '</urlset>\n'
+INDEX_OPEN = '<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_CLOSE = '</sitemapindex>\n'
+MANIFEST = 'manifest.json'
+
+
+def _url(location, lastmod=None, changefreq=None, priority=None):
+    parts = [f'<loc>{escape(location)}</loc>']
+    if lastmod:
+        parts.append(f'<lastmod>{lastmod.date().isoformat()}</lastmod>')
+    if changefreq:
+        parts.append(f'<changefreq>{changefreq}</changefreq>')
+    if priority is not None:
+        parts.append(f'<priority>{priority}</priority>')
+    return f'<url>{"".join(parts)}</url>\n'
+
+
+def _write(path, chunks):
+    """
+    The file is written next to the old one and replaced at once, so the web workers never serve a partial sitemap
+    """
+
+    temporary = path.with_suffix('.tmp')
+    with temporary.open('w', encoding='utf-8') as file:
+        file.writelines(chunks)
+    os.replace(temporary, path)
+
+
+def _article_buckets():
+    """
+    Published articles grouped into pages of SITEMAP_PAGE_SIZE ids: number of articles and time of the last change per page
+    """
+
+    buckets = Article.objects.filter(status='P')\
+        .annotate(bucket=F('id') / settings.SITEMAP_PAGE_SIZE)\
+        .values('bucket')\
+        .annotate(count=Count('id'), updated_at=Max('updated_at'))\
+        .order_by('bucket')
+    return {str(row['bucket']): row for row in buckets}
+
+
+def _article_urls(bucket, base_url):
+    start = int(bucket) * settings.SITEMAP_PAGE_SIZE
+    articles = Article.objects.filter(status='P', id__gte=start, id__lt=start + settings.SITEMAP_PAGE_SIZE)\
+        .order_by('id')\
+        .values_list('slug', 'updated_at')\
+        .iterator(chunk_size=2000)
+
+    yield URLSET_OPEN
+    for slug, updated_at in articles:
+        location = base_url + reverse('blog:article_detail', kwargs={'slug': slug})
+        yield _url(location, updated_at, ArticleSitemap.changefreq, ArticleSitemap.priority)
+    yield URLSET_CLOSE
+
+
+def _static_urls(base_url):
+    sitemap = StaticSitemap()
+    yield URLSET_OPEN
+    for item in sitemap.items():
+        yield _url(base_url + sitemap.location(item))
+    yield URLSET_CLOSE
+
+
+def generate_sitemaps(full=False):
+    """
+    Writing the sitemap index and its pages to SITEMAP_ROOT. Only the pages of articles whose number of articles
+    or time of the last change differ from the previous run are rendered again, unless full is set.
+    Returns the number of rendered pages.
+    """
+
+    root = Path(settings.SITEMAP_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    base_url = f'{ArticleSitemap.protocol}://{Site.objects.get_current().domain}'
+
+    try:
+        previous = {} if full else json.loads((root / MANIFEST).read_text())
+    except (FileNotFoundError, ValueError):
+        previous = {}
+
+    buckets = _article_buckets()
+    manifest = {bucket: [row['count'], row['updated_at'].isoformat()] for bucket, row in buckets.items()}
+
+    _write(root / 'static.xml', _static_urls(base_url))
+    rendered = 1
+    for bucket in buckets:
+        if previous.get(bucket) != manifest[bucket] or not (root / f'articles-{bucket}.xml').exists():
+            _write(root / f'articles-{bucket}.xml', _article_urls(bucket, base_url))
+            rendered += 1
+
+    sections = [('static', None)] + [(f'articles-{bucket}', row['updated_at']) for bucket, row in buckets.items()]
+    _write(root / 'sitemap.xml', [INDEX_OPEN] + [
+        f'<sitemap><loc>{escape(base_url + reverse("sitemap_section", kwargs={"name": name}))}</loc>'
+        + (f'<lastmod>{updated_at.isoformat()}</lastmod>' if updated_at else '')
+        + '</sitemap>\n'
+        for name, updated_at in sections
+    ] + [INDEX_CLOSE])
+
+    for path in root.glob('articles-*.xml'):
+        if path.stem.removeprefix('articles-') not in manifest:
+            path.unlink(missing_ok=True)
+    _write(root / MANIFEST, [json.dumps(manifest)])
+    return rendered
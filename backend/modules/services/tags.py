@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+
+from taggit.models import TaggedItem
+
+from ..blog.models import Article, TagPopularity
+
+from .cache import bump_generation
+
+
+ADJUST_SQL = '''
+    INSERT INTO {table} (tag_id, article_count)
+    SELECT tag_id, GREATEST(%s, 0) FROM unnest(%s::integer[]) AS tag_id
+    ON CONFLICT (tag_id) DO UPDATE SET article_count = GREATEST({table}.article_count + %s, 0)
+'''
+
+REBUILD_SQL = '''
+    WITH counts AS (
+        SELECT item.tag_id, count(*) AS article_count
+        FROM {tagged_items} AS item
+        JOIN {articles} AS article ON article.id = item.object_id
+        WHERE item.content_type_id = %s AND article.status = 'P'
+        GROUP BY item.tag_id
+    ), upserted AS (
+        INSERT INTO {table} (tag_id, article_count)
+        SELECT tag_id, article_count FROM counts
+        ON CONFLICT (tag_id) DO UPDATE SET article_count = EXCLUDED.article_count
+    )
+    DELETE FROM {table} WHERE tag_id NOT IN (SELECT tag_id FROM counts)
+'''
+
+
+def adjust_tag_counts(tag_ids, delta):
+    """
+    Incrementing (or decrementing) the counters of the given tags with a single upsert
+    """
+
+    tag_ids = list(tag_ids)
+    if not tag_ids or not delta:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(ADJUST_SQL.format(table=TagPopularity._meta.db_table), [delta, tag_ids, delta])
+    transaction.on_commit(lambda: bump_generation('tags'))
+
+
+def article_tag_ids(article_id):
+    content_type = ContentType.objects.get_for_model(Article)
+    return TaggedItem.objects.filter(content_type=content_type, object_id=article_id).values_list('tag_id', flat=True)
+
+
+def rebuild_tag_popularity():
+    """
+    Full recalculation of the counters, corrects any drift of the incremental updates
+    """
+
+    sql = REBUILD_SQL.format(
+        table=TagPopularity._meta.db_table,
+        tagged_items=TaggedItem._meta.db_table,
+        articles=Article._meta.db_table,
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, [ContentType.objects.get_for_model(Article).pk])
+    bump_generation('tags')
+
+
+def get_popular_tags(count=None):
+    """
+    The most used tags of published articles, read from the popularity table
+    """
+
+    popularity = TagPopularity.objects.filter(article_count__gt=0)\
+        .order_by('-article_count', 'tag_id')\
+        .values('tag__name', 'tag__slug', 'article_count')[:count or settings.POPULAR_TAGS_COUNT]
+    return [{'name': row['tag__name'], 'slug': row['tag__slug'], 'num_times': row['article_count']} for row in popularity]
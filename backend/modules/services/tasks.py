@@ -1,8 +1,18 @@
 from celery import shared_task
+from celery.signals import worker_ready
 
 from django.core.management import call_command
 
 from .email import send_activate_email_message, send_contact_email_message
+from .viewers import flush_views
+from .similarity import update_article_similarity, rebuild_similarity_index
+from .search import warm_search_cache
+from .timelines import fanout_article, rebuild_timeline, rebuild_follower_timelines, retract_article
+from .tags import rebuild_tag_popularity
+from .sitemaps import generate_sitemaps
+from .images import process_thumbnail, process_avatar
+from .uploads import collect_uploads, rebuild_upload_references
+from .rendering import render_article
 
 
 @shared_task
@@ -28,7 +38,172 @@ def send_contact_email_message_task(subject, email, content, ip, user_id):
 @shared_task
 def dbackup_task():
     """
-    Performing a database backup
+    Performing a database backup, a full one every DBACKUP_FULL_INTERVAL days and incremental ones in between
     """
 
-    return call_command('dbackup')
\ No newline at end of file
+    return call_command('dbackup')
+
+
+@shared_task
+def flush_viewers_task():
+    """
+    Writing the article views buffered in Redis to the database
+    """
+
+    return flush_views()
+
+
+@shared_task
+def update_article_similarity_task(article_id):
+    """
+    1. The task is queued by the signals of modules.blog when the tags or the status of an article change
+    2. Similar articles are recalculated through the function: update_article_similarity
+    """
+
+    return update_article_similarity(article_id)
+
+
+@shared_task
+def rebuild_similarity_index_task():
+    """
+    Full rebuild of the similar articles index
+    """
+
+    return rebuild_similarity_index()
+
+
+@shared_task
+def warm_search_cache_task():
+    """
+    Caching the results of the most popular search queries
+    """
+
+    return warm_search_cache()
+
+
+@worker_ready.connect
+def warm_search_cache_after_deploy(sender, **kwargs):
+    """
+    The cache of search results is warmed up every time a worker starts, that is, after every deploy
+    """
+
+    warm_search_cache_task.delay()
+
+
+@shared_task
+def fanout_article_task(article_id):
+    """
+    1. The task is queued by the signals of modules.blog when an article is published
+    2. The article is added to the timelines of the followers of its author through the function: fanout_article
+    """
+
+    return fanout_article(article_id)
+
+
+@shared_task
+def retract_article_task(article_id, author_id):
+    """
+    1. The task is queued by the signals of modules.blog when an article is deleted or unpublished
+    2. The article is removed from the timelines of the followers of its author through the function: retract_article
+    """
+
+    return retract_article(article_id, author_id)
+
+
+@shared_task
+def rebuild_timeline_task(user_id):
+    """
+    Rebuilding the timeline of a user after their subscriptions have changed
+    """
+
+    return rebuild_timeline(user_id)
+
+
+@shared_task
+def rebuild_follower_timelines_task(author_ids):
+    """
+    1. The task is queued by import_articles for the authors of the imported published articles
+    2. The existing timelines of their followers are rebuilt through the function: rebuild_follower_timelines
+    """
+
+    return rebuild_follower_timelines(author_ids)
+
+
+@shared_task
+def rebuild_tag_popularity_task():
+    """
+    Full recalculation of the number of published articles per tag
+    """
+
+    return rebuild_tag_popularity()
+
+
+@shared_task
+def generate_sitemaps_task():
+    """
+    Writing the changed pages of the sitemap to disk
+    """
+
+    return generate_sitemaps()
+
+
+@shared_task
+def process_thumbnail_task(article_id, name, obsolete):
+    """
+    1. The task is queued by the signals of modules.blog when the thumbnail of an article changes
+    2. It is routed to the 'images' queue, so the image processing runs in the processes of a separate worker
+    3. Resized variants of the thumbnail are rendered through the function: process_thumbnail
+    """
+
+    return process_thumbnail(article_id, name, obsolete)
+
+
+@shared_task
+def process_thumbnails_task(thumbnails):
+    """
+    1. The task is queued by the import of articles (ArticleImporter) for every imported chunk
+    2. It is routed to the 'images' queue together with process_thumbnail_task
+    3. Variants of the thumbnails [(article_id, name), ...] are rendered one by one through the function: process_thumbnail
+    """
+
+    processed = 0
+    for article_id, name in thumbnails:
+        try:
+            processed += process_thumbnail(article_id, name) is not None
+        except (OSError, ValueError):
+            continue
+    return processed
+
+
+@shared_task
+def process_avatar_task(profile_id, name, obsolete):
+    """
+    1. The task is queued by the signals of modules.system when the avatar of a profile changes
+    2. It is routed to the 'images' queue together with process_thumbnail_task
+    3. Small and medium variants of the avatar are rendered through the function: process_avatar
+    """
+
+    return process_avatar(profile_id, name, obsolete)
+
+
+@shared_task
+def collect_uploads_task():
+    """
+    1. The task is started by celery beat every night (CELERY_BEAT_SCHEDULE)
+    2. The references are recounted first through the function: rebuild_upload_references,
+       so a drift of the incremental counters never deletes a linked file
+    3. Uploaded files no article links to are deleted through the function: collect_uploads
+    """
+
+    rebuild_upload_references()
+    return collect_uploads()
+
+
+@shared_task
+def render_article_task(article_id):
+    """
+    1. The task is queued by the signals of modules.blog for articles longer than ARTICLE_RENDER_INLINE_LIMIT
+    2. The stored HTML, excerpt and number of words are rendered through the function: render_article
+    """
+
+    return render_article(article_id)
@@ -0,0 +1,189 @@
+import json
+import shutil
+import tempfile
+
+from time import sleep
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from modules.blog.models import Article, Category, Comment, Rating, Viewer
+from modules.services.backups import (
+    ENCODER, MANIFEST, HashingWriter, _compressor, _read_rows, backup_models, create_backup, read_manifest, restore_backup
+)
+from modules.services.rendering import render_html
+
+
+class RestoreBackupTest(TransactionTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(DBACKUP_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        author = User.objects.create_user(username='author', password='password')
+        category = Category.objects.create(title='Category', slug='category', description='Category')
+        self.article = Article.objects.create(
+            title='Article', slug='article', author=author, category=category,
+            short_description='<p>Short</p>', full_description='<p>Full</p>', status='P',
+        )
+        self.rating = Rating.objects.create(article=self.article, user=author, value=1, ip_address='127.0.0.1')
+
+    def test_restore_into_schema_with_new_not_null_columns(self):
+        # A backup made before blog.article had updated_at and word_count
+        path = create_backup(workers=1)
+        manifest = read_manifest(path)
+        shard = manifest['models']['blog.article']
+        removed = [shard['columns'].index('updated_at'), shard['columns'].index('word_count')]
+        rows = [
+            [value for index, value in enumerate(row) if index not in removed]
+            for row in _read_rows(path / shard['file'], manifest['compression'])
+        ]
+        with open(path / shard['file'], 'wb') as file:
+            writer = HashingWriter(file)
+            with _compressor(writer, manifest['compression']) as stream:
+                stream.write(''.join(ENCODER.encode(row) + '\n' for row in rows).encode())
+        shard.update(
+            columns=[column for index, column in enumerate(shard['columns']) if index not in removed],
+            rows=len(rows), bytes=writer.size, sha256=writer.digest.hexdigest(),
+        )
+        (path / MANIFEST).write_text(json.dumps(manifest, indent=2))
+
+        Article.objects.filter(pk=self.article.pk).update(title='Changed')
+        restore_backup(path, workers=1)
+
+        article = Article.objects.filter().get()
+        self.assertEqual((article.pk, article.title, article.word_count), (self.article.pk, 'Article', 0))
+        self.assertIsNotNone(article.updated_at)
+        self.assertTrue(Rating.objects.filter(pk=self.rating.pk).exists())
+
+    def test_restore_refused_while_unlisted_table_refers_to_restored(self):
+        with override_settings(DBACKUP_EXCLUDE=('sessions.session', 'blog.rating')):
+            path = create_backup(workers=1)
+        Article.objects.filter(pk=self.article.pk).update(title='Changed')
+
+        with self.assertRaises(ValueError):
+            restore_backup(path, workers=1)
+
+        self.assertEqual(Article.objects.filter().get().title, 'Changed')
+        self.assertTrue(Rating.objects.filter(pk=self.rating.pk).exists())
+
+
+class IncrementalBackupTest(TransactionTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(DBACKUP_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.author = User.objects.create_user(username='author', password='password')
+        self.editor = User.objects.create_user(username='editor', password='password')
+        category = Category.objects.create(title='Category', slug='category', description='Category')
+        Category.objects.create(title='Child', slug='child', description='Child', parent=category)
+        self.article = Article.objects.create(
+            title='Article', slug='article', author=self.author, the_one_who_updated=self.editor, category=category,
+            short_description='<p>Short</p>', full_description='<p>Full</p>', status='P',
+        )
+        self.root = Comment.objects.create(article=self.article, author=self.author, content='Root')
+        self.removed = Comment.objects.create(article=self.article, author=self.author, content='Removed', parent=self.root)
+        self.article.viewers.add(Viewer.objects.create(user=self.editor, ip_address='127.0.0.2'))
+        Rating.objects.toggle(self.article.pk, '127.0.0.1', 1, self.author.pk)
+
+    def snapshot(self):
+        return {
+            label: list(model._base_manager.order_by('pk').values_list())
+            for label, model in ((label, apps.get_model(label)) for label in backup_models())
+        }
+
+    def test_restore_chain(self):
+        create_backup(workers=1, mode='full')
+
+        article = Article.objects.filter().get()
+        article.title = 'Changed'
+        article.save()
+        # Toggled off by the raw DELETE of TOGGLE_SQL, replaced by a rating of another address
+        Rating.objects.toggle(self.article.pk, '127.0.0.1', 1, self.author.pk)
+        Rating.objects.toggle(self.article.pk, '127.0.0.3', -1)
+        Comment.objects.create(article=self.article, author=self.author, content='Reply', parent=self.root)
+        self.removed.delete()
+        # SET_NULL of the_one_who_updated and of the viewer, without touching their watermarks
+        self.editor.delete()
+
+        # Backups are named by the second they were made in
+        sleep(1)
+        path = create_backup(workers=1, mode='incremental')
+        manifest = read_manifest(path)
+        self.assertEqual(manifest['kind'], 'incremental')
+        self.assertEqual(manifest['models']['blog.rating']['deleted']['rows'], 1)
+        self.assertEqual(manifest['models']['blog.comment']['deleted']['rows'], 1)
+        expected = self.snapshot()
+
+        Article.objects.filter(pk=self.article.pk).update(title='Lost', rating_sum=10)
+        Rating.objects.all().delete()
+        Comment.objects.create(article=self.article, author=self.author, content='Lost', parent=self.root)
+        restore_backup(path, workers=1)
+
+        self.assertEqual(self.snapshot(), expected)
+        article = Article.objects.filter().get()
+        self.assertEqual((article.title, article.the_one_who_updated_id, article.rating_sum, article.comment_count), ('Changed', None, -1, 2))
+        self.assertEqual(list(Viewer.objects.values_list('user_id', flat=True)), [None])
+        reply = Comment.objects.get(content='Reply')
+        self.assertEqual((reply.tree_id, reply.level, reply.lft, reply.rght), (self.root.tree_id, 1, 2, 3))
+
+
+class RenderHTMLTest(SimpleTestCase):
+
+    def assertRenders(self, source, html):
+        self.assertEqual(render_html(source).html, html)
+
+    def test_unsafe_urls_are_removed(self):
+        self.assertRenders('<a href="javascript:alert(1)">a</a>', '<a>a</a>')
+        self.assertRenders('<a href=" JaVaScRiPt:alert(1)">a</a>', '<a>a</a>')
+        self.assertRenders('<img src="data:image/svg+xml;base64,PHN2Zz4=">', '<img loading="lazy" decoding="async">')
+        self.assertRenders('<a href="https://example.com/?a=1&amp;b=2">a</a>', '<a href="https://example.com/?a=1&amp;b=2">a</a>')
+        self.assertRenders('<a href="/articles/">a</a>', '<a href="/articles/">a</a>')
+
+    def test_event_handlers_are_removed(self):
+        self.assertRenders('<p onclick="alert(1)" class="lead">a</p>', '<p class="lead">a</p>')
+        self.assertRenders('<img src="/a.png" onerror="alert(1)">', '<img src="/a.png" loading="lazy" decoding="async">')
+
+    def test_dropped_tags_keep_their_content_out(self):
+        self.assertRenders('<script>alert(1)</script><p>a</p>', '<p>a</p>')
+        self.assertRenders('<iframe><p>hidden</p></iframe><p>a</p>', '<p>a</p>')
+        self.assertRenders('<svg><svg></svg><script>alert(1)</script></svg><p>a</p>', '<p>a</p>')
+        self.assertRenders('<p>a</p><iframe><p>hidden', '<p>a</p>')
+        self.assertRenders('<blink>a</blink>', 'a')
+
+    def test_styles_are_filtered(self):
+        self.assertRenders('<p style="color: red; position: fixed">a</p>', '<p style="color:red">a</p>')
+        self.assertRenders('<p style="background-color: url(https://example.com/a.png)">a</p>', '<p>a</p>')
+        self.assertRenders('<p style="width: expression(alert(1))">a</p>', '<p>a</p>')
+        self.assertRenders('<p style="color: red&quot;&gt;&lt;script&gt;">a</p>', '<p>a</p>')
+
+    def test_unbalanced_tags_are_closed(self):
+        self.assertRenders('<p><strong>a</p>', '<p><strong>a</strong></p>')
+        self.assertRenders('<ul><li>a', '<ul><li>a</li></ul>')
+        self.assertRenders('</div><p>a</p>', '<p>a</p>')
+
+    def test_links_opened_in_new_tab_get_rel(self):
+        self.assertRenders(
+            '<a href="https://example.com" target="_blank" rel="opener">a</a>',
+            '<a href="https://example.com" target="_blank" rel="noopener noreferrer">a</a>',
+        )
+
+    def test_media_embeds_are_kept(self):
+        self.assertRenders(
+            '<figure class="media"><oembed url="https://www.youtube.com/watch?v=1"></oembed></figure>',
+            '<figure class="media"><oembed url="https://www.youtube.com/watch?v=1"></oembed></figure>',
+        )
+        self.assertRenders('<oembed url="javascript:alert(1)"></oembed>', '<oembed></oembed>')
+
+    def test_text_and_word_count(self):
+        rendered = render_html('<h1>Title</h1><p>One <b>two</b></p><script>three</script>')
+        self.assertEqual(rendered.text, 'Title One two')
+        self.assertEqual(rendered.word_count, 3)
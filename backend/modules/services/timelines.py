@@ -0,0 +1,153 @@
+from django.conf import settings
+
+from ..blog.models import Article
+from ..system.models import Profile
+
+from .utils import IdSequence, get_redis_connection
+
+
+PULL_AUTHORS_KEY = 'timeline-pull-authors'
+# Kept in a rebuilt timeline without articles, so the timeline exists and is not rebuilt on every request
+# (no article has the id 0, the lowest score keeps it out of the way of the trimming of the newest articles)
+EMPTY_MARKER = 0
+
+
+def timeline_key(user_id):
+    return f'timeline-{user_id}'
+
+
+def _add_to_timelines(pipe, user_ids, articles):
+    for user_id in user_ids:
+        pipe.zadd(timeline_key(user_id), {article_id: created_at.timestamp() for article_id, created_at in articles})
+        pipe.zremrangebyrank(timeline_key(user_id), 0, -settings.TIMELINE_SIZE - 1)
+
+
+def fanout_article(article_id):
+    """
+    Push a published article to the timelines of the followers of its author.
+    Authors with more than TIMELINE_FANOUT_MAX_FOLLOWERS followers are not pushed, their articles are read at request time.
+    """
+
+    article = Article.objects.filter(pk=article_id, status='P').values('id', 'author_id', 'created_at').first()
+    if article is None:
+        return 0
+
+    redis = get_redis_connection()
+    followers = Profile.objects.filter(following__user_id=article['author_id']).values_list('user_id', flat=True)
+    if followers.count() > settings.TIMELINE_FANOUT_MAX_FOLLOWERS:
+        redis.sadd(PULL_AUTHORS_KEY, article['author_id'])
+        return 0
+    redis.srem(PULL_AUTHORS_KEY, article['author_id'])
+
+    pushed = 0
+    pipe = redis.pipeline(transaction=False)
+    for user_id in followers.iterator(chunk_size=1000):
+        _add_to_timelines(pipe, [user_id], [(article['id'], article['created_at'])])
+        pushed += 1
+        if pushed % 1000 == 0:
+            pipe.execute()
+    pipe.execute()
+    return pushed
+
+
+def retract_article(article_id, author_id):
+    """
+    Remove an article that was deleted or is no longer published from the timelines of the followers of its author
+    """
+
+    if Article.objects.filter(pk=article_id, status='P').exists():
+        return 0
+
+    redis = get_redis_connection()
+    followers = Profile.objects.filter(following__user_id=author_id).values_list('user_id', flat=True)
+
+    removed = 0
+    pipe = redis.pipeline(transaction=False)
+    for user_id in followers.iterator(chunk_size=1000):
+        pipe.zrem(timeline_key(user_id), article_id)
+        removed += 1
+        if removed % 1000 == 0:
+            pipe.execute()
+    pipe.execute()
+    return removed
+
+
+def _latest_articles(author_ids):
+    return Article.objects.all()\
+        .filter(author_id__in=author_ids)\
+        .order_by('-created_at')\
+        .values_list('id', 'created_at')[:settings.TIMELINE_SIZE]
+
+
+def rebuild_timeline(user_id):
+    """
+    Refill the timeline of a user from the latest articles of the authors they follow
+    """
+
+    redis = get_redis_connection()
+    pull_authors = {int(author_id) for author_id in redis.smembers(PULL_AUTHORS_KEY)}
+    author_ids = set(Profile.objects.filter(followers__user_id=user_id).values_list('user_id', flat=True)) - pull_authors
+
+    pipe = redis.pipeline()
+    pipe.delete(timeline_key(user_id))
+    articles = list(_latest_articles(author_ids)) if author_ids else []
+    if articles:
+        _add_to_timelines(pipe, [user_id], articles)
+    else:
+        pipe.zadd(timeline_key(user_id), {EMPTY_MARKER: float('-inf')})
+    pipe.execute()
+    return len(articles)
+
+
+def rebuild_follower_timelines(author_ids, batch_size=1000):
+    """
+    Rebuilding the existing timelines of the followers of the given authors, after articles were added
+    without the signals (import_articles). Missing timelines are built on the next read anyway.
+    Returns the number of rebuilt timelines.
+    """
+
+    redis = get_redis_connection()
+    followers = Profile.objects.filter(following__user_id__in=author_ids)\
+        .values_list('user_id', flat=True).distinct().order_by('user_id')
+
+    rebuilt = 0
+    user_ids = list(followers)
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        pipe = redis.pipeline(transaction=False)
+        for user_id in batch:
+            pipe.exists(timeline_key(user_id))
+        for user_id, exists in zip(batch, pipe.execute()):
+            if exists:
+                rebuild_timeline(user_id)
+                rebuilt += 1
+    return rebuilt
+
+
+def timeline_articles(user):
+    """
+    Articles of the authors followed by the user, newest first: one range read of the timeline,
+    merged with the latest articles of the followed authors who are not pushed
+    """
+
+    redis = get_redis_connection()
+    pipe = redis.pipeline()
+    pipe.exists(timeline_key(user.pk))
+    pipe.zrevrange(timeline_key(user.pk), 0, -1, withscores=True)
+    pipe.smembers(PULL_AUTHORS_KEY)
+    exists, entries, pull_authors = pipe.execute()
+
+    if not exists:
+        rebuild_timeline(user.pk)
+        entries = redis.zrevrange(timeline_key(user.pk), 0, -1, withscores=True)
+
+    entries = [(int(article_id), score) for article_id, score in entries if int(article_id) != EMPTY_MARKER]
+    if pull_authors:
+        followed = Profile.objects.filter(followers__user_id=user.pk, user_id__in=[int(author_id) for author_id in pull_authors])
+        author_ids = list(followed.values_list('user_id', flat=True))
+        if author_ids:
+            entries += [(article_id, created_at.timestamp()) for article_id, created_at in _latest_articles(author_ids)]
+            entries.sort(key=lambda entry: entry[1], reverse=True)
+
+    article_ids = list(dict.fromkeys(article_id for article_id, _ in entries))
+    return IdSequence(Article.objects.all(), article_ids[:settings.TIMELINE_SIZE])
@@ -0,0 +1,74 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from ..blog.models import Article, UploadBlob
+
+from .utils import CkeditorCustomStorage
+
+
+UPLOAD_NAME_RE = re.compile(re.escape(CkeditorCustomStorage.base_url) + r'([0-9a-f]{2}/[0-9a-f]{64}\.\w+)')
+
+REBUILD_SQL = '''
+    UPDATE {table} AS blob SET reference_count = coalesce(
+        (SELECT counts.reference_count FROM unnest(%s::varchar[], %s::integer[]) AS counts(name, reference_count)
+         WHERE counts.name = blob.name),
+        0
+    )
+'''
+
+
+def referenced_uploads(*texts):
+    """
+    Names of the uploaded files linked from the given HTML
+    """
+
+    return {name for text in texts if text for name in UPLOAD_NAME_RE.findall(text)}
+
+
+def article_uploads(article):
+    return referenced_uploads(article.short_description, article.full_description)
+
+
+def adjust_upload_references(names, delta):
+    if names and delta:
+        UploadBlob.objects.filter(name__in=names).update(reference_count=Greatest(F('reference_count') + delta, 0))
+
+
+def rebuild_upload_references():
+    """
+    Full recount of the references from the text of all articles, corrects any drift of the incremental updates
+    """
+
+    counts = {}
+    texts = Article.objects.values_list('short_description', 'full_description').iterator(chunk_size=500)
+    for short_description, full_description in texts:
+        for name in referenced_uploads(short_description, full_description):
+            counts[name] = counts.get(name, 0) + 1
+
+    with connection.cursor() as cursor:
+        cursor.execute(REBUILD_SQL.format(table=UploadBlob._meta.db_table), [list(counts), list(counts.values())])
+    return len(counts)
+
+
+def collect_uploads(grace=None):
+    """
+    Deleting the files no article links to, uploaded more than grace seconds ago (UPLOAD_BLOB_GRACE by default):
+    the grace period keeps the files of articles that are still being written.
+    The row is deleted first and only if it is still unreferenced, then the file. Returns the number of deleted files.
+    """
+
+    storage = CkeditorCustomStorage()
+    cutoff = timezone.now() - timezone.timedelta(seconds=settings.UPLOAD_BLOB_GRACE if grace is None else grace)
+    names = UploadBlob.objects.filter(reference_count=0, uploaded_at__lt=cutoff).values_list('name', flat=True)
+
+    deleted = 0
+    for name in list(names):
+        if UploadBlob.objects.filter(name=name, reference_count=0, uploaded_at__lt=cutoff).delete()[0]:
+            storage.delete(name)
+            deleted += 1
+    return deleted
@@ -1,25 +1,103 @@
 import os
+import re
 
-from uuid import uuid4
-from datetime import datetime
+from hashlib import sha256
+from tempfile import NamedTemporaryFile
+from functools import lru_cache
 from urllib.parse import urljoin
 
+from django.apps import apps
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
 from django.utils.text import slugify
 from django.core.files.storage import FileSystemStorage
 from django.conf import settings
 
 from PIL import Image, ImageOps
+from redis import Redis
+
+
+SLUG_SAVE_ATTEMPTS = 5
+
+
+def _slug_base(model, source):
+    """
+    Slug of the source shortened so that a numeric suffix still fits the field, the model name for empty slugs
+    """
+
+    max_length = model._meta.get_field('slug').max_length
+    return (slugify(source) or model._meta.model_name)[:max_length - 10].strip('-')
+
+
+def _allocate_slug(base, taken, suffixes):
+    """
+    The base itself or base-2, base-3... whichever is not taken yet. The allocated slug is added to taken,
+    suffixes remembers the last suffix per base, so a batch does not probe the same slugs again.
+    """
+
+    slug, suffix = base, suffixes.get(base, 1)
+    while slug in taken:
+        suffix += 1
+        slug = f'{base}-{suffix}'
+    suffixes[base] = suffix
+    taken.add(slug)
+    return slug
 
 
 def unique_slugify(instance, slug):
-    
+    """
+    A free slug for the instance, found with one query: the slugs equal to the base or the base with a numeric suffix
+    (the LIKE prefix is served by the varchar_pattern_ops index Django creates for unique slug fields)
+    """
+
     model = instance.__class__
-    unique_slug = slugify(slug)
+    base = _slug_base(model, slug)
+    taken = model.objects.filter(slug__startswith=base)\
+        .filter(Q(slug=base) | Q(slug__regex=rf'^{re.escape(base)}-[0-9]+$'))\
+        .exclude(pk=instance.pk)\
+        .values_list('slug', flat=True)
+    return _allocate_slug(base, set(taken), {})
+
+
+def unique_slugify_batch(model, sources, batch_size=1000):
+    """
+    Free slugs for many new rows at once (imports): the taken slugs of all bases are read with one query per batch
+    of bases, the slugs repeated within the sources get numeric suffixes as well. Returns the slugs in the order of sources.
+    """
+
+    bases = [_slug_base(model, source) for source in sources]
+    unique_bases = list(dict.fromkeys(bases))
+    query = f'SELECT slug FROM {model._meta.db_table} WHERE slug LIKE ANY(%s)'
 
-    while model.objects.filter(slug=unique_slug).exists():
-        unique_slug = f"{unique_slug}-{uuid4().hex[:8]}"
+    taken = set()
+    with connection.cursor() as cursor:
+        for start in range(0, len(unique_bases), batch_size):
+            patterns = [
+                base.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                for base in unique_bases[start:start + batch_size]
+            ]
+            cursor.execute(query, [patterns])
+            taken.update(slug for slug, in cursor.fetchall())
 
-    return unique_slug
+    suffixes = {}
+    return [_allocate_slug(base, taken, suffixes) for base in bases]
+
+
+def save_with_unique_slug(instance, source, save, *args, **kwargs):
+    """
+    Saving an instance without a slug. The slug is allocated by unique_slugify, a concurrent insert of the same slug
+    makes the save fail with IntegrityError inside a savepoint, then the slug is allocated again and the save is retried.
+    """
+
+    for attempt in range(SLUG_SAVE_ATTEMPTS):
+        instance.slug = unique_slugify(instance, source)
+        try:
+            with transaction.atomic():
+                return save(*args, **kwargs)
+        except IntegrityError:
+            conflict = instance.__class__.objects.filter(slug=instance.slug).exclude(pk=instance.pk).exists()
+            if not conflict or attempt == SLUG_SAVE_ATTEMPTS - 1:
+                raise
 
 
 def get_client_ip(request):
@@ -31,6 +109,44 @@ def get_client_ip(request):
     return ip
 
 
+@lru_cache(maxsize=None)
+def get_redis_connection():
+    """
+    Shared Redis client (with its own connection pool) for data structures that do not fit the cache API
+    """
+    return Redis.from_url(settings.CACHES['default']['LOCATION'])
+
+
+class IdSequence:
+    """
+    A sequence over a precomputed list of ids for Paginator: only the objects of the requested page are fetched.
+    Slices past the end of the list are taken from the fallback queryset, if any.
+    """
+
+    def __init__(self, queryset, ids, total=None, fallback=None):
+        self.queryset = queryset
+        self.ids = ids
+        self.total = len(ids) if total is None else total
+        self.fallback = fallback
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        if index.stop is not None and index.stop > len(self.ids) and self.fallback is not None:
+            return list(self.fallback[index])
+
+        ids = self.ids[index]
+        objects = self.queryset.in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
+
+
 def image_compress(image_path, height, width):
     image = Image.open(image_path)
 
@@ -66,19 +182,42 @@ def image_compress(image_path, height, width):
 
 class CkeditorCustomStorage(FileSystemStorage):
     """
-    Custom location for editor media files
+    Content addressed storage for editor media files: an upload is hashed while it is streamed to a temporary file
+    and stored as <first 2 hex digits>/<sha256>.<extension>. A file uploaded again is not written twice,
+    the name (and the URL) of the stored copy is returned. Every stored file is recorded as an UploadBlob.
     """
-    
-    def get_folder_name(self):
-        return datetime.now().strftime('%Y/%m/%d')
 
-    def get_valid_name(self, name):
+    def get_available_name(self, name, max_length=None):
+        # The name is derived from the content in _save, equal names mean equal files
         return name
 
     def _save(self, name, content):
-        folder_name = self.get_folder_name()
-        name = os.path.join(folder_name, self.get_valid_name(name))
-        return super()._save(name, content)
+        temporary_dir = os.path.join(self.location, '.tmp')
+        os.makedirs(temporary_dir, exist_ok=True)
+
+        digest = sha256()
+        size = 0
+        with NamedTemporaryFile(dir=temporary_dir, delete=False) as file:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                file.write(chunk)
+                size += len(chunk)
+
+        extension = os.path.splitext(name)[1].lower()
+        name = f'{digest.hexdigest()[:2]}/{digest.hexdigest()}{extension}'
+        path = self.path(name)
+        if os.path.exists(path):
+            os.unlink(file.name)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Atomic within one file system: parallel uploads of the same file end up with one complete copy
+            os.replace(file.name, path)
+            if self.file_permissions_mode is not None:
+                os.chmod(path, self.file_permissions_mode)
+
+        # The time of the upload is refreshed on duplicates, so a file re-used in a draft is not collected
+        apps.get_model('blog', 'UploadBlob').objects.update_or_create(name=name, defaults={'size': size})
+        return name
 
     location = os.path.join(settings.MEDIA_ROOT, 'uploads/')
     base_url = urljoin(settings.MEDIA_URL, 'uploads/')
\ No newline at end of file
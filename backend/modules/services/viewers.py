@@ -0,0 +1,162 @@
+import json
+
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q, F, Case, When, Value
+
+from ..blog.models import Article, Viewer
+
+from .utils import get_redis_connection
+
+
+PENDING_KEY = 'viewers-pending'
+
+# Returns one row per inserted link: links inserted meanwhile by another flush are skipped and not counted
+INSERT_LINKS_SQL = '''
+    INSERT INTO {table} (article_id, viewer_id)
+    SELECT * FROM unnest(%s::bigint[], %s::bigint[])
+    ON CONFLICT (article_id, viewer_id) DO NOTHING
+    RETURNING article_id
+'''
+
+
+def seen_key(article_id):
+    return f'viewers-seen-{article_id}'
+
+
+def queue_key(article_id):
+    return f'viewers-queue-{article_id}'
+
+
+def register_view(article_id, user_id, ip_address):
+    """
+    Buffer an article view in Redis.
+    A visitor (the user if authenticated, otherwise the IP address) is queued only once per article.
+    """
+
+    redis = get_redis_connection()
+    visitor = f'user-{user_id}' if user_id else f'ip-{ip_address}'
+
+    pipe = redis.pipeline()
+    pipe.sadd(seen_key(article_id), visitor)
+    pipe.expire(seen_key(article_id), settings.VIEWERS_DEDUP_TIMEOUT)
+    added, _ = pipe.execute()
+
+    if added:
+        pipe = redis.pipeline()
+        pipe.rpush(queue_key(article_id), json.dumps([user_id, ip_address]))
+        pipe.sadd(PENDING_KEY, article_id)
+        pipe.execute()
+
+
+def _pop_pending_views(redis):
+    """
+    Queued views of a batch of pending articles, None when no article is pending
+    """
+
+    article_ids = redis.spop(PENDING_KEY, count=settings.VIEWERS_FLUSH_BATCH)
+    if not article_ids:
+        return None
+
+    pipe = redis.pipeline()
+    for article_id in article_ids:
+        pipe.lrange(queue_key(int(article_id)), 0, -1)
+        pipe.delete(queue_key(int(article_id)))
+    results = pipe.execute()
+
+    views = {}
+    for article_id, queued in zip(article_ids, results[::2]):
+        # The id of an article is added again to the pending set after its queue was already drained
+        if queued:
+            views[int(article_id)] = [tuple(json.loads(item)) for item in queued]
+    return views
+
+
+def _requeue_views(redis, views):
+    pipe = redis.pipeline()
+    for article_id, visitors in views.items():
+        if not visitors:
+            continue
+        pipe.rpush(queue_key(article_id), *[json.dumps(list(visitor)) for visitor in visitors])
+        pipe.sadd(PENDING_KEY, article_id)
+    pipe.execute()
+
+
+def _get_or_create_viewers(visitors):
+    """
+    Resolve (user_id, ip_address) pairs to Viewer ids, creating the missing viewers in bulk
+    """
+
+    viewer_ids = {}
+    visitors = list(visitors)
+    for start in range(0, len(visitors), settings.VIEWERS_FLUSH_BATCH):
+        chunk = visitors[start:start + settings.VIEWERS_FLUSH_BATCH]
+        condition = reduce(or_, (Q(user_id=user_id, ip_address=ip_address) for user_id, ip_address in chunk))
+        for viewer_id, user_id, ip_address in Viewer.objects.filter(condition).order_by('-id').values_list('id', 'user_id', 'ip_address'):
+            viewer_ids[(user_id, ip_address)] = viewer_id
+
+    missing = [Viewer(user_id=user_id, ip_address=ip_address) for user_id, ip_address in visitors if (user_id, ip_address) not in viewer_ids]
+    for viewer in Viewer.objects.bulk_create(missing):
+        viewer_ids[(viewer.user_id, viewer.ip_address)] = viewer.id
+    return viewer_ids
+
+
+def _flush_batch(redis, views):
+    try:
+        with transaction.atomic():
+            # Views of articles deleted in the meantime are dropped
+            article_ids = set(Article.objects.filter(id__in=views.keys()).values_list('id', flat=True))
+            views = {article_id: visitors for article_id, visitors in views.items() if article_id in article_ids}
+            viewer_ids = _get_or_create_viewers({visitor for visitors in views.values() for visitor in visitors})
+            existing = set(
+                Article.viewers.through.objects
+                .filter(article_id__in=views.keys(), viewer_id__in=viewer_ids.values())
+                .values_list('article_id', 'viewer_id')
+            )
+
+            links = set()
+            for article_id, visitors in views.items():
+                for visitor in visitors:
+                    link = (article_id, viewer_ids[visitor])
+                    if link not in existing:
+                        links.add(link)
+
+            inserted = []
+            if links:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        INSERT_LINKS_SQL.format(table=Article.viewers.through._meta.db_table),
+                        [list(column) for column in zip(*links)],
+                    )
+                    inserted = [article_id for article_id, in cursor.fetchall()]
+
+            # The insert does not send m2m_changed, so the view counters are adjusted here in one statement
+            added = Counter(inserted)
+            if added:
+                Article.objects.filter(pk__in=added.keys()).update(view_count=F('view_count') + Case(
+                    *[When(pk=article_id, then=Value(count)) for article_id, count in added.items()],
+                    default=Value(0),
+                ))
+    except Exception:
+        _requeue_views(redis, views)
+        raise
+
+    return len(inserted)
+
+
+def flush_views():
+    """
+    Move the views buffered in Redis to the database in bulk.
+    Returns the number of new article-viewer links.
+    """
+
+    redis = get_redis_connection()
+    created = 0
+    while (views := _pop_pending_views(redis)) is not None:
+        if views:
+            created += _flush_batch(redis, views)
+    return created
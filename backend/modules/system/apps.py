@@ -5,3 +5,6 @@ class SystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'modules.system'
     verbose_name = 'System'
+
+    def ready(self):
+        from . import signals
\ No newline at end of file
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.6 on 2026-10-18 07:09
+
+import django.core.validators
+from django.db import migrations, models
+
+
+# Profiles with the former shared default avatar get the generated initials instead
+CLEAR_DEFAULT_AVATAR_SQL = "UPDATE app_profiles SET avatar = '' WHERE avatar = 'images/avatars/avatar.jpg'"
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('system', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Avatar variants'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='avatar',
+            field=models.ImageField(blank=True, upload_to='images/avatars/%Y/%m/%d/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=('png', 'jpg', 'jpeg'))], verbose_name='Avatar'),
+        ),
+        migrations.RunSQL(CLEAR_DEFAULT_AVATAR_SQL, migrations.RunSQL.noop),
+    ]
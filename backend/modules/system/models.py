@@ -7,7 +7,7 @@ from django.urls import reverse
 from django.utils import timezone
 from django.core.cache import cache
 
-from modules.services.utils import unique_slugify
+from modules.services.utils import save_with_unique_slug
 
 
 User = get_user_model()
@@ -44,12 +44,17 @@ class Profile(models.Model):
     avatar = models.ImageField(
         verbose_name='Avatar',
         upload_to='images/avatars/%Y/%m/%d/', 
-        default='images/avatars/avatar.jpg',
         blank=True,  
         validators=[
             FileExtensionValidator(allowed_extensions=('png', 'jpg', 'jpeg'))
         ]
     )
+    avatar_variants = models.JSONField(
+        verbose_name='Avatar variants',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     bio = models.TextField(
         max_length=500, 
         blank=True, 
@@ -62,10 +67,23 @@ class Profile(models.Model):
     )
 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Values loaded from the database, used to detect a new avatar on save
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = unique_slugify(self, self.user.username)
-        super().save(*args, **kwargs)
+        if self.avatar.name != getattr(self, '_loaded_values', {}).get('avatar', ''):
+            # The upload is stored as is, the small and medium variants are rendered on the 'images' queue (see signals)
+            self._obsolete_variants = list(self.avatar_variants.values())
+            self.avatar_variants = {}
+        if self.slug:
+            super().save(*args, **kwargs)
+        else:
+            save_with_unique_slug(self, self.user.username, super().save, *args, **kwargs)
+        self._loaded_values = {**getattr(self, '_loaded_values', {}), 'avatar': self.avatar.name}
     
     def __str__(self):
         return self.user.username
@@ -81,11 +99,25 @@ class Profile(models.Model):
             return True
         return False
 
+    def avatar_url(self, size):
+        """
+        The variant of the avatar of the given size, the upload itself while the variants are not rendered yet
+        and the generated initials when there is no avatar
+        """
+
+        if not self.avatar:
+            return reverse('system:avatar_initials', kwargs={'slug': self.slug})
+        if size in self.avatar_variants:
+            return self.avatar.storage.url(self.avatar_variants[size])
+        return self.avatar.url
+
     @property
     def get_avatar(self):
-        if self.avatar:
-            return self.avatar.url
-        return f'https://ui-avatars.com/api/?size=150&background=random&name={self.slug}'
+        return self.avatar_url('medium')
+
+    @property
+    def get_avatar_small(self):
+        return self.avatar_url('small')
     
 
 
@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Profile
+
+from ..services.tasks import process_avatar_task
+
+
+
+# <-- Avatar variants -->
+
+
+@receiver(post_save, sender=Profile)
+def avatar_changed(sender, instance, **kwargs):
+    if instance.avatar.name == getattr(instance, '_loaded_values', {}).get('avatar', ''):
+        return
+    profile_id, name, obsolete = instance.pk, instance.avatar.name, getattr(instance, '_obsolete_variants', [])
+    if name or obsolete:
+        transaction.on_commit(lambda: process_avatar_task.delay(profile_id, name, obsolete))
@@ -8,6 +8,7 @@ from .views import (
     UserConfirmEmailView, EmailConfirmationSentView, 
     EmailConfirmedView, EmailConfirmationFailedView,
     FeedbackCreateView, ProfileFollowingCreateView,
+    ProfileAvatarInitialsView,
 )
 
 app_name = 'system'
@@ -15,6 +16,7 @@ app_name = 'system'
 urlpatterns = [
     path('user/edit/', ProfileUpdateView.as_view(), name='profile_edit'),
     path('user/<slug:slug>/', ProfileDetailView.as_view(), name='profile_detail'),
+    path('user/<slug:slug>/avatar.svg', ProfileAvatarInitialsView.as_view(), name='avatar_initials'),
     path('user/follow/<slug:slug>/', ProfileFollowingCreateView.as_view(), name='follow'),
     path('login/', UserLoginView.as_view(), name='login'),
     path('logout/', UserLogoutView.as_view(), name='logout'),
@@ -14,7 +14,7 @@ from django.contrib.auth.views import (
 )
 from django.db import transaction
 from django.contrib.messages.views import SuccessMessageMixin
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, Http404
 from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth import login
 from django.contrib.auth import get_user_model
@@ -22,6 +22,7 @@ from django.shortcuts import render
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
 from django.contrib.auth.tokens import default_token_generator
 from django.urls import reverse_lazy
 
@@ -39,6 +40,7 @@ from .forms import (
 
 from ..services.mixins import UserIsNotAuthenticated
 from ..services.utils import get_client_ip
+from ..services.images import render_initials_avatar
 from ..services.tasks import send_activate_email_message_task, send_contact_email_message_task
 
 
@@ -290,7 +292,7 @@ class ProfileFollowingCreateView(View):
             'username': profile.user.username,
             'get_absolute_url': profile.get_absolute_url(),
             'slug': profile.slug,
-            'avatar': profile.get_avatar,
+            'avatar': profile.get_avatar_small,
             'message': message,
             'status': status,
         }
@@ -298,6 +300,20 @@ class ProfileFollowingCreateView(View):
 
 
 
+@method_decorator(cache_control(public=True, max_age=60 * 60 * 24 * 30), name='dispatch')
+class ProfileAvatarInitialsView(View):
+    """
+    Default avatar of the profiles without an upload, rendered from the slug. Only the existence of the profile
+    is looked up: the render is cheap and the response is cached by the browser and the proxies.
+    """
+
+    def get(self, request, slug):
+        if not Profile.objects.filter(slug=slug).exists():
+            raise Http404('Profile not found')
+        return HttpResponse(render_initials_avatar(slug), content_type='image/svg+xml')
+
+
+
 # <-- Custom templates for error pages 403, 404, 500 -->
 
 
@@ -14,4 +14,29 @@ const getCookie = (name) => {
   	return cookieValue;
 };
 
-const csrftoken = getCookie("csrftoken");
\ No newline at end of file
+let csrftoken = getCookie("csrftoken");
+
+const fragmentsUrl = document.body.getAttribute("data-fragments");
+
+if (fragmentsUrl) {
+	loadFragments(fragmentsUrl);
+}
+
+// Pages of anonymous visitors can be served from the page cache, the parts that depend on the visitor are loaded separately
+async function loadFragments(url) {
+	try {
+		const response = await fetch(url, {
+			headers: {"X-Requested-With": "XMLHttpRequest"},
+		});
+		const fragments = await response.json();
+		csrftoken = fragments.csrf_token;
+		document.querySelector("#user-box").innerHTML = fragments.user;
+		document.querySelector("#messages").innerHTML = fragments.messages;
+		if (fragments.rating) {
+			document.querySelectorAll(`.rating-buttons [data-value="${fragments.rating}"]`).forEach(button => button.classList.add("active"));
+		}
+	}
+	catch (error) {
+		console.log(error);
+	}
+}
\ No newline at end of file
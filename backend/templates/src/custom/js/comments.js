@@ -1,19 +1,83 @@
 const commentForm = document.forms.commentForm;
-const commentFormContent = commentForm.content;
-const commentFormParentInput = commentForm.parent;
-const commentFormSubmit = commentForm.commentSubmit;
-const commentArticleId = commentForm.getAttribute('data-article-id');
+const commentThreads = document.querySelector('.nested-comments');
+const commentThreadsArticleId = commentThreads.getAttribute('data-article-id');
+const commentsMore = document.querySelector('#commentsMore');
 
-commentForm.addEventListener('submit', createComment);
+if (commentForm) {
+    var commentFormContent = commentForm.content;
+    var commentFormParentInput = commentForm.parent;
+    var commentFormSubmit = commentForm.commentSubmit;
+    var commentArticleId = commentForm.getAttribute('data-article-id');
 
-replyUser()
+    commentForm.addEventListener('submit', createComment);
+}
+if (commentsMore) {
+    commentsMore.addEventListener('click', loadThreads);
+}
 
-function replyUser() {
-    document.querySelectorAll('.btn-reply').forEach(e => {
+replyUser(document)
+showReplies(document)
+
+function replyUser(container) {
+    if (!commentForm) {
+        return;
+    }
+    container.querySelectorAll('.btn-reply').forEach(e => {
         e.addEventListener('click', replyComment);
     });
 }
 
+function showReplies(container) {
+    container.querySelectorAll('.btn-replies').forEach(e => {
+        e.addEventListener('click', loadReplies);
+    });
+}
+
+async function fetchThreads(params) {
+    const response = await fetch(`/articles/${commentThreadsArticleId}/comments/?${new URLSearchParams(params)}`, {
+        headers: {'X-Requested-With': 'XMLHttpRequest'},
+    });
+    return await response.json();
+}
+
+function insertThreads(element, position, html) {
+    const container = document.createElement('div');
+    container.innerHTML = html;
+    replyUser(container);
+    showReplies(container);
+    element.insertAdjacentElement(position, container);
+}
+
+async function loadThreads() {
+    commentsMore.disabled = true;
+    try {
+        const threads = await fetchThreads({after: commentsMore.getAttribute('data-next')});
+        insertThreads(commentThreads, 'beforeend', threads.html);
+        if (threads.next) {
+            commentsMore.setAttribute('data-next', threads.next);
+            commentsMore.disabled = false;
+        }
+        else {
+            commentsMore.remove();
+        }
+    }
+    catch (error) {
+        console.log(error)
+    }
+}
+
+async function loadReplies() {
+    this.disabled = true;
+    try {
+        const replies = await fetchThreads({parent: this.getAttribute('data-comment-id')});
+        insertThreads(this, 'afterend', replies.html);
+        this.remove();
+    }
+    catch (error) {
+        console.log(error)
+    }
+}
+
 function replyComment() {
     const commentUsername = this.getAttribute('data-comment-username');
     const commentMessageId = this.getAttribute('data-comment-id');
@@ -39,7 +103,7 @@ async function createComment(event) {
                                     <li class="card border-0">
                                         <div class="row">
                                             <div class="col-md-2">
-                                                <img src="${comment.avatar}" style="width: 120px;height: 120px;object-fit: cover;" alt="${comment.author}"/>
+                                                <img src="${comment.avatar}" loading="lazy" style="width: 120px;height: 120px;object-fit: cover;" alt="${comment.author}"/>
                                             </div>
                                             <div class="col-md-10">
                                                 <div class="card-body">
@@ -57,17 +121,15 @@ async function createComment(event) {
                                         </div>
                                     </li>
                                 </ul>`;
-        if (comment.is_child) {
-            document.querySelector(`#comment-thread-${comment.parent_id}`).insertAdjacentHTML("beforeend", commentTemplate);
-        }
-        else {
-            document.querySelector('.nested-comments').insertAdjacentHTML("beforeend", commentTemplate)
+        const parentThread = comment.is_child ? document.querySelector(`#comment-thread-${comment.parent_id}`) : commentThreads;
+        if (parentThread) {
+            parentThread.insertAdjacentHTML("beforeend", commentTemplate);
+            replyUser(parentThread.lastElementChild);
         }
         commentForm.reset()
         commentFormSubmit.disabled = false;
         commentFormSubmit.innerText = "Add a comment";
         commentFormParentInput.value = null;
-        replyUser();
     }
     catch (error) {
         console.log(error)